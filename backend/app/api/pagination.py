@@ -0,0 +1,56 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+# Response header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Opaque cursor for the sort key of the last row on a page
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """
+    Sort key encoded in cursor, converted to the types of columns
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError("cursor does not match the sort key")
+        return [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+            for column, value in zip(columns, payload)
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset(query, columns: Sequence[Any], cursor: Optional[str], limit: int):
+    """
+    Order query by columns and start it after cursor.
+
+    The last column must be unique (the primary key) so the order is total.
+    Seeking past the cursor instead of using an offset keeps every page as
+    cheap as the first when an index covers columns. One row more than limit
+    is fetched so keyset_page can tell whether another page follows.
+    """
+    if cursor:
+        query = query.filter(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+    return query.order_by(*columns).limit(limit + 1)
+
+def keyset_page(rows: Sequence[Any], columns: Sequence[Any], limit: int, response: Response) -> List[Any]:
+    """
+    Drop the look-ahead row and put the cursor for the next page in the response headers
+    """
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows
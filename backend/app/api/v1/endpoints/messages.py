@@ -1,43 +1,201 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import os
+import shutil
+import uuid
+import zlib
+from typing import Any, Iterator, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from app.api import deps
-from app.schemas.message import Message, MessageCreate, MessageUpdate
+from app.api.pagination import keyset, keyset_page
+from app.schemas.message import (
+    BulkItemResult, Message, MessageBulkUpdate, MessageCreate, MessageIds, MessageSummary, MessageUpdate,
+)
 from app.models.message import Message as MessageModel
 from app.models.user import User as UserModel
-from app.core.tasks import send_message_scheduled_notification_background
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.delivery_timer import delivery_timer
+from app.services.notification_debouncer import notification_debouncer
+from app.services.message_email import RENDERED_FIELDS, prerender_message
+from app.services.job_queue import enqueue_job
+from app.services import job_handlers  # noqa: F401  (registers the job kinds enqueued below)
 
 router = APIRouter()
 
+# Message fields that appear in the "has been scheduled" notification
+NOTIFIED_FIELDS = ("title", "delivery_date", "recipient_email")
+
+# Fields a message list can be narrowed to with ?fields=
+SPARSE_FIELDS = tuple(name for name in Message.model_fields if name in MessageModel.__table__.columns)
+
+# Sort key of the message lists, see app.api.pagination
+LIST_ORDER = (MessageModel.delivery_date, MessageModel.id)
+
+def parse_fields(fields: str) -> List[str]:
+    """
+    Field names requested with ?fields=a,b; id is always included
+    """
+    names = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    unknown = [name for name in names if name not in SPARSE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def list_message_columns(
+    db: Session, user_id: int, names: List[str], cursor: Optional[str], limit: int, response: Response
+) -> list:
+    """
+    One page of a user's messages with only the named columns read from the database
+    """
+    columns = [getattr(MessageModel, name) for name in names]
+    columns += [column for column in LIST_ORDER if column.key not in names]
+    query = db.query(*columns).filter(MessageModel.user_id == user_id)
+    return keyset_page(keyset(query, LIST_ORDER, cursor, limit).all(), LIST_ORDER, limit, response)
+
+def apply_message_update(message: MessageModel, update_data: dict, sender_name: Optional[str]) -> bool:
+    """
+    Apply update_data to message; returns True if a field in the scheduled notification changed
+    """
+    notified_before = {field: getattr(message, field) for field in NOTIFIED_FIELDS}
+    for field, value in update_data.items():
+        setattr(message, field, value)
+    
+    # A new recipient gets a fresh set of delivery attempts
+    if "recipient_email" in update_data:
+        message.attempt_count = 0
+        message.next_attempt_at = None
+        message.last_error = None
+        message.is_dead_lettered = False
+    
+    if RENDERED_FIELDS & update_data.keys():
+        prerender_message(message, sender_name)
+    return any(getattr(message, field) != value for field, value in notified_before.items())
+
+def notify_timer(message: MessageModel):
+    """
+    Tell the delivery timer when the message is next due: its pending retry, if any, else its delivery date
+    """
+    delivery_timer.notify_message_changed(
+        message.id, message.next_attempt_at or message.delivery_date, message.is_delivered
+    )
+
+async def notify_scheduled(user_id: int, messages: List[MessageModel]):
+    """
+    Queue the "has been scheduled" notification for a user's messages, sent once edits have settled
+    """
+    if settings.SEND_NOTIFICATION_EMAILS:
+        await notification_debouncer.messages_changed(user_id, [
+            (message.id, message.recipient_email)
+            for message in messages
+            if message.recipient_email and not message.is_delivered
+        ])
+
+def message_export_chunks(user_id: int, compress: bool) -> Iterator[bytes]:
+    """
+    A user's messages as NDJSON, read in batches of EXPORT_BATCH_SIZE and sent as each batch is ready
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    columns = [getattr(MessageModel, name) for name in SPARSE_FIELDS]
+    last_id = 0
+    while True:
+        # Each batch is read in its own short transaction. The response can take
+        # a long time to reach the client, and an open read on SQLite would
+        # block every writer until then.
+        with SessionLocal() as db:
+            batch = db.execute(
+                select(*columns)
+                .where(MessageModel.user_id == user_id, MessageModel.id > last_id)
+                .order_by(MessageModel.id)
+                .limit(settings.EXPORT_BATCH_SIZE)
+            ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        # Stored messages were validated on the way in, only serialize them
+        chunk = b"".join(
+            Message.model_construct(**row._asdict()).model_dump_json().encode() + b"\n"
+            for row in batch
+        )
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield chunk
+    if compressor:
+        yield compressor.flush()
+
+def check_bulk_size(count: int):
+    if not count:
+        raise HTTPException(status_code=400, detail="No messages given")
+    if count > settings.MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.MAX_BULK_ITEMS} messages per request")
+
 @router.get("/", response_model=List[Message])
 def read_messages(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return instead of the whole message"),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Retrieve messages.
+    Retrieve messages by delivery date.
+
+    Pass the X-Next-Cursor header of a response as cursor to get the page after it.
     """
-    messages = (
-        db.query(MessageModel)
-        .filter(MessageModel.user_id == current_user.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+    if fields is not None:
+        names = parse_fields(fields)
+        rows = list_message_columns(db, current_user.id, names, cursor, limit, response)
+        return JSONResponse(
+            jsonable_encoder([{name: getattr(row, name) for name in names} for row in rows]),
+            headers=dict(response.headers),
+        )
+    query = db.query(MessageModel).filter(MessageModel.user_id == current_user.id)
+    return keyset_page(keyset(query, LIST_ORDER, cursor, limit).all(), LIST_ORDER, limit, response)
+
+@router.get("/summary", response_model=List[MessageSummary])
+def read_message_summaries(
+    response: Response,
+    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve messages without their content, paginated like the full list.
+    """
+    return list_message_columns(db, current_user.id, list(MessageSummary.model_fields), cursor, limit, response)
+
+@router.get("/export")
+def export_messages(
+    gzip: bool = False,
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Download all messages as newline-delimited JSON, optionally gzip-compressed.
+    """
+    headers = {"Content-Disposition": 'attachment; filename="messages.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        message_export_chunks(current_user.id, gzip), media_type="application/x-ndjson", headers=headers
     )
-    return messages
 
 @router.post("/", response_model=Message)
 async def create_message(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     message_in: MessageCreate,
-    background_tasks: BackgroundTasks,
-    current_user: UserModel = Depends(deps.get_current_active_user),
+    current_user: UserModel = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Create new message.
@@ -46,73 +204,135 @@ async def create_message(
         **message_in.dict(),
         user_id=current_user.id
     )
+    prerender_message(message, current_user.full_name)
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
+    notify_timer(message)
+    await notify_scheduled(current_user.id, [message])
+    return message
+
+@router.post("/bulk", response_model=List[BulkItemResult])
+async def create_messages(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    messages_in: List[MessageCreate],
+    current_user: UserModel = Depends(deps.get_current_active_user_async),
+) -> Any:
+    """
+    Create many messages in one transaction.
+    """
+    check_bulk_size(len(messages_in))
+    rows = []
+    for message_in in messages_in:
+        row = dict(message_in.dict(), user_id=current_user.id)
+        message = MessageModel(**row)
+        prerender_message(message, current_user.full_name)
+        rows.append(dict(row, rendered_email=message.rendered_email))
     
-    # Send a notification that the message has been scheduled
-    if settings.SEND_NOTIFICATION_EMAILS and message.recipient_email:
-        await send_message_scheduled_notification_background(
-            background_tasks=background_tasks,
-            recipient_email=message.recipient_email,
-            message_title=message.title,
-            delivery_date=message.delivery_date.strftime('%Y-%m-%d %H:%M:%S')
-        )
+    # INSERT ... RETURNING makes no promise about the order of the returned
+    # rows, so have them matched back to the input rows. Where the dialect
+    # cannot correlate a multi-row INSERT (SQLite), this costs one INSERT per row
+    messages = (await db.scalars(
+        insert(MessageModel).returning(MessageModel, sort_by_parameter_order=True), rows
+    )).all()
+    await db.commit()
+    for message in messages:
+        notify_timer(message)
+    await notify_scheduled(current_user.id, messages)
+    return [BulkItemResult(index=index, id=message.id, status="created") for index, message in enumerate(messages)]
+
+@router.put("/bulk", response_model=List[BulkItemResult])
+async def update_messages(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    messages_in: List[MessageBulkUpdate],
+    current_user: UserModel = Depends(deps.get_current_active_user_async),
+) -> Any:
+    """
+    Update many messages, identified by their id, in one transaction.
+    """
+    check_bulk_size(len(messages_in))
+    ids = [message_in.id for message_in in messages_in]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="A message may only appear once")
+    messages = {
+        message.id: message
+        for message in (await db.scalars(
+            select(MessageModel).where(MessageModel.id.in_(ids), MessageModel.user_id == current_user.id)
+        )).all()
+    }
     
-    return message
+    results, changed = [], []
+    for index, message_in in enumerate(messages_in):
+        message = messages.get(message_in.id)
+        if message is None:
+            results.append(BulkItemResult(index=index, id=message_in.id, status="not_found"))
+            continue
+        if apply_message_update(message, message_in.dict(exclude_unset=True, exclude={"id"}), current_user.full_name):
+            changed.append(message)
+        results.append(BulkItemResult(index=index, id=message.id, status="updated"))
+    await db.commit()
+    
+    for message in messages.values():
+        notify_timer(message)
+    await notify_scheduled(current_user.id, changed)
+    return results
+
+@router.post("/bulk/delete", response_model=List[BulkItemResult])
+async def delete_messages(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    message_ids: MessageIds,
+    current_user: UserModel = Depends(deps.get_current_active_user_async),
+) -> Any:
+    """
+    Delete many messages in one statement.
+    """
+    check_bulk_size(len(message_ids.ids))
+    deleted = set((await db.scalars(
+        delete(MessageModel)
+        .where(MessageModel.id.in_(message_ids.ids), MessageModel.user_id == current_user.id)
+        .returning(MessageModel.id)
+    )).all())
+    await db.commit()
+    for message_id in deleted:
+        delivery_timer.notify_message_deleted(message_id)
+    return [
+        BulkItemResult(index=index, id=message_id, status="deleted" if message_id in deleted else "not_found")
+        for index, message_id in enumerate(message_ids.ids)
+    ]
 
 @router.put("/{message_id}", response_model=Message)
 async def update_message(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     message_id: int,
     message_in: MessageUpdate,
-    background_tasks: BackgroundTasks,
-    current_user: UserModel = Depends(deps.get_current_active_user),
+    current_user: UserModel = Depends(deps.get_current_active_user_async),
 ) -> Any:
     """
     Update a message.
     """
-    message = (
-        db.query(MessageModel)
-        .filter(
+    message = (await db.execute(
+        select(MessageModel)
+        .where(
             MessageModel.id == message_id,
             MessageModel.user_id == current_user.id
         )
-        .first()
-    )
+    )).scalar_one_or_none()
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    # Store the old delivery date to check if it changed
-    old_delivery_date = message.delivery_date
-    
-    # Update the message
-    for field, value in message_in.dict(exclude_unset=True).items():
-        setattr(message, field, value)
-    
+    notified_changed = apply_message_update(message, message_in.dict(exclude_unset=True), current_user.full_name)
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
+    notify_timer(message)
     
-    # If the delivery date changed and there's a recipient email, send a notification
-    if (settings.SEND_NOTIFICATION_EMAILS and 
-        message.recipient_email and 
-        (old_delivery_date != message.delivery_date or 
-         not hasattr(message, 'delivery_date_changed_notification_sent') or 
-         not message.delivery_date_changed_notification_sent)):
-        
-        await send_message_scheduled_notification_background(
-            background_tasks=background_tasks,
-            recipient_email=message.recipient_email,
-            message_title=message.title,
-            delivery_date=message.delivery_date.strftime('%Y-%m-%d %H:%M:%S')
-        )
-        
-        # Mark that we've sent the notification
-        message.delivery_date_changed_notification_sent = True
-        db.add(message)
-        db.commit()
+    # If the schedule changed and there's a recipient email, notify once edits have settled
+    if notified_changed:
+        await notify_scheduled(current_user.id, [message])
     
     return message
 
@@ -139,14 +359,76 @@ def read_message(
     return message
 
 @router.delete("/{message_id}")
-def delete_message(
+async def delete_message(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    message_id: int,
+    current_user: UserModel = Depends(deps.get_current_active_user_async),
+) -> Any:
+    """
+    Delete a message.
+    """
+    message = (await db.execute(
+        select(MessageModel)
+        .where(
+            MessageModel.id == message_id,
+            MessageModel.user_id == current_user.id
+        )
+    )).scalar_one_or_none()
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    
+    await db.delete(message)
+    await db.commit()
+    delivery_timer.notify_message_deleted(message_id)
+    return {"status": "success"} 
+
+@router.post("/{message_id}/media", status_code=202)
+def upload_media(
     *,
     db: Session = Depends(deps.get_db),
     message_id: int,
+    file: UploadFile = File(...),
     current_user: UserModel = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Delete a message.
+    Stage a media file and queue its upload; the URL is added to media_urls once a worker has uploaded it.
+    """
+    message = (
+        db.query(MessageModel)
+        .filter(
+            MessageModel.id == message_id,
+            MessageModel.user_id == current_user.id
+        )
+        .first()
+    )
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    
+    filename = os.path.basename(file.filename or "upload")
+    os.makedirs(settings.JOB_STAGING_DIR, exist_ok=True)
+    # Absolute, so a worker started from another directory finds it too
+    path = os.path.abspath(os.path.join(settings.JOB_STAGING_DIR, f"{uuid.uuid4().hex}_{filename}"))
+    with open(path, "wb") as staged:
+        shutil.copyfileobj(file.file, staged)
+    
+    job = enqueue_job(db, "media.upload", {
+        "message_id": message.id,
+        "path": path,
+        "filename": filename,
+        "content_type": file.content_type,
+    })
+    return {"job_id": job.id, "status": job.status}
+
+@router.post("/{message_id}/generate", status_code=202)
+def generate_content(
+    *,
+    db: Session = Depends(deps.get_db),
+    message_id: int,
+    current_user: UserModel = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Queue AI generation for a message using its generation_settings.
     """
     message = (
         db.query(MessageModel)
@@ -159,6 +441,5 @@ def delete_message(
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    db.delete(message)
-    db.commit()
-    return {"status": "success"} 
\ No newline at end of file
+    job = enqueue_job(db, "ai.generate", {"message_id": message.id})
+    return {"job_id": job.id, "status": job.status}
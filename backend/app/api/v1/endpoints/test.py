@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from app.core.email import send_email, EmailSchema
+from app.core.send_guard import SendPausedError
 from pydantic import BaseModel, EmailStr
 
 router = APIRouter()
@@ -33,5 +34,7 @@ async def test_email(email_data: TestEmail):
             return {"message": "Test email sent successfully"}
         else:
             raise HTTPException(status_code=500, detail="Failed to send email")
+    except SendPausedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,9 +1,11 @@
-from typing import Any, List
-from fastapi import APIRouter, Body, Depends, HTTPException
+from typing import Any, List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.api.pagination import keyset, keyset_page
+from app.core.config import settings
 from app.core.security import get_password_hash
 from app.schemas.user import User, UserCreate, UserUpdate
 from app.models.user import User as UserModel
@@ -12,16 +14,19 @@ router = APIRouter()
 
 @router.get("/", response_model=List[User])
 def read_users(
+    response: Response,
     db: Session = Depends(deps.get_db),
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
     current_user: UserModel = Depends(deps.get_current_active_superuser),
 ) -> Any:
     """
-    Retrieve users.
+    Retrieve users in sign-up order.
+
+    Pass the X-Next-Cursor header of a response as cursor to get the page after it.
     """
-    users = db.query(UserModel).offset(skip).limit(limit).all()
-    return users
+    columns = (UserModel.created_at, UserModel.id)
+    return keyset_page(keyset(db.query(UserModel), columns, cursor, limit).all(), columns, limit, response)
 
 @router.post("/", response_model=User)
 def create_user(
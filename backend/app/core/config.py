@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import EmailStr
 from pydantic_settings import BaseSettings
 
@@ -6,6 +6,9 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "AfterLife Message Platform"
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
+    MAX_PAGE_SIZE: int = 500  # Largest limit accepted by the paginated list endpoints
+    MAX_BULK_ITEMS: int = 500  # Most messages one bulk create, update or delete may contain
+    EXPORT_BATCH_SIZE: int = 500  # Messages read from the database per batch while streaming an export
     
     # Security
     SECRET_KEY: str = "your-secret-key-here"  # Change this in production
@@ -13,12 +16,55 @@ class Settings(BaseSettings):
     
     # Database
     SQLALCHEMY_DATABASE_URI: str = "sqlite:///./afterlife.db"
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None  # Async endpoints and the scheduler; defaults to the URI above with aiosqlite or asyncpg
+    SYNC_SCHEMA_ON_STARTUP: bool = True  # The API brings the schema up to date as it starts; turn off with several API workers and run migrate.py once instead
 
     # Scheduler Configuration
     SCHEDULER_ENABLED: bool = True  # Enabled by default
+    SCHEDULER_MAX_CONCURRENCY: int = 10  # Messages delivered in parallel
+    SCHEDULER_BATCH_SIZE: int = 500  # Due messages fetched and queued per batch, capped so a batch fits the claim TTL
+    SCHEDULER_WINDOW_SECONDS: int = 3600  # How far ahead the delivery timer keeps messages in memory
+    SCHEDULER_POLL_SECONDS: float = 30  # How often the idle delivery timer checks for overdue messages it was not told about
+    SCHEDULER_CHANGE_POLL_SECONDS: float = 0  # How often the API's delivery timer looks for messages written by other processes; 0 relies on in-process wakeups, set it when running several API workers
+    SCHEDULER_STANDALONE_CHANGE_POLL_SECONDS: float = 1.0  # The same for run_scheduler.py and run_delivery_worker.py, which never get the API's wakeups
+    SCHEDULER_LEASE_TTL_SECONDS: int = 30  # Leader lease expiry; a dead scheduler is replaced after this
+    DELIVERY_CLAIM_TTL_SECONDS: int = 300  # Claimed messages become claimable again after this
+    DELIVERY_MAX_ATTEMPTS: int = 8  # Failed messages are dead-lettered after this many attempts
+    DELIVERY_RETRY_BASE_SECONDS: int = 60  # First retry delay, doubled on every further failure
+    DELIVERY_RETRY_MAX_SECONDS: int = 6 * 60 * 60  # Upper bound for the retry delay
+    DELIVERY_FLUSH_SIZE: int = 100  # Delivery outcomes buffered before they are committed
+    DELIVERY_FLUSH_INTERVAL_SECONDS: float = 1.0  # Longest time an outcome stays buffered
+    DELIVERY_JOURNAL_DIR: str = "./delivery_journal"  # Crash journal of sent but unflushed messages
+    SENDER_QUOTA_PER_INTERVAL: int = 200  # Messages one sender may have sent per interval, 0 for no quota
+    SENDER_QUOTA_INTERVAL_SECONDS: int = 60
+    SENDER_WEIGHTS: Dict[int, float] = {}  # User id -> share of delivery capacity and quota, default 1
+    FAIR_SHARE_POOL_SIZE: int = 5000  # Earliest due messages ranked per claim; bounds the cost of a claim
+    MAX_LATENESS_SECONDS: int = 900  # Messages this late skip the quota and go first
+    DIGEST_MODE: Literal["off", "recipient", "sender"] = "off"  # Combine due messages per recipient, or per sender and recipient
+    DIGEST_MAX_MESSAGES: int = 50  # Larger digests are split into several emails of at most this many messages
+    DIGEST_WINDOW_SECONDS: int = 0  # In digest mode, messages due this soon are sent early with the digest; 0 never sends early
+    
+    # Catch-up Configuration (draining a backlog after downtime)
+    CATCHUP_THRESHOLD: int = 1000  # Overdue messages needed to enter catch-up mode
+    CATCHUP_ON_TIME_SECONDS: int = 300  # Messages overdue by less than this are not part of the backlog
+    CATCHUP_CHUNK_SIZE: int = 100  # Backlog messages claimed per chunk
+    CATCHUP_RATE_PER_SECOND: float = 20.0  # Backlog messages sent per second
+    CATCHUP_RATE_WINDOW_SECONDS: int = 300  # Window used to measure the drain rate
+    
+    # Durable Job Queue (email, AI and media work run by run_job_worker.py)
+    JOB_LANES: Dict[str, int] = {"critical": 0, "default": 10, "bulk": 20}  # Lane name -> priority, lower runs first
+    JOB_WORKER_CONCURRENCY: int = 4  # Jobs one worker process runs at once
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300  # A running job is handed to another worker after this
+    JOB_MAX_ATTEMPTS: int = 5  # Failed jobs are marked dead after this many attempts
+    JOB_RETRY_BASE_SECONDS: int = 30  # First retry delay, doubled on every further failure
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0  # How often an idle worker looks for new jobs
+    JOB_STAGING_DIR: str = "./job_staging"  # Uploaded files wait here until a worker picks them up; workers on other hosts need it on shared storage
+    JOB_APP_WORKER_LANES: List[str] = ["critical"]  # Lanes the API process works on itself, so email goes out without run_job_worker.py; [] leaves every job to run_job_worker.py
     
     # Notification Configuration
     SEND_NOTIFICATION_EMAILS: bool = False  # Disabled by default
+    NOTIFICATION_QUIET_SECONDS: float = 30  # Scheduled notifications wait until edits stop for this long
+    NOTIFICATION_MAX_DELAY_SECONDS: float = 300  # Upper bound for that wait while edits keep coming
 
     # Email Configuration
     MAIL_USERNAME: str
@@ -31,6 +77,32 @@ class Settings(BaseSettings):
     MAIL_SSL: bool = True
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = False  # Changed to False to avoid SSL verification issues
+    
+    # SMTP Connection Pool
+    SMTP_POOL_SIZE: int = 10  # Maximum open SMTP connections
+    SMTP_POOL_IDLE_TIMEOUT_SECONDS: int = 60  # Idle connections older than this are closed
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100  # Connections are recycled after this many messages
+    SMTP_HEALTH_CHECK_SECONDS: int = 15  # Connections idle for longer are checked with NOOP before reuse
+    SMTP_TIMEOUT_SECONDS: int = 30
+
+    # Outbound SMTP protection (adaptive concurrency and circuit breaker)
+    SMTP_ADAPTIVE_MIN_CONCURRENCY: int = 1  # Concurrent sends never drop below this
+    SMTP_ADAPTIVE_MAX_CONCURRENCY: int = 10  # Concurrent sends never grow above this
+    SMTP_LATENCY_TARGET_SECONDS: float = 2.0  # Sends slower than this lower the concurrency limit
+    SMTP_BACKOFF_FACTOR: float = 0.5  # Concurrency limit is multiplied by this on failure or slowness
+    SMTP_BREAKER_WINDOW: int = 20  # Recent sends the error rate is computed over
+    SMTP_BREAKER_MIN_CALLS: int = 10  # Sends needed in the window before the breaker can open
+    SMTP_BREAKER_ERROR_RATE: float = 0.5  # Error rate at which sending is paused
+    SMTP_BREAKER_OPEN_SECONDS: float = 30  # Pause before a probe send is let through
+    SMTP_BREAKER_MAX_WAIT_SECONDS: float = 60  # Sends waiting longer than this fail and are retried later; keep below DELIVERY_CLAIM_TTL_SECONDS
+    SMTP_SLOT_WAIT_SECONDS: float = 60  # Same for sends waiting on the concurrency limit
+    
+    # Per recipient domain throttling
+    DOMAIN_RATE_PER_SECOND: float = 5.0  # Default sends per second to one domain
+    DOMAIN_BURST: int = 10  # Default burst allowance per domain
+    DOMAIN_MAX_CONCURRENCY: int = 2  # Default concurrent SMTP sessions per domain
+    DOMAIN_LIMITS: Dict[str, Dict[str, float]] = {}  # Overrides, e.g. {"gmail.com": {"rate": 10, "burst": 20, "concurrency": 4}}
+    DELIVERY_GROUP_SIZE: int = 20  # Messages to one domain sent over a single SMTP session
 
     # AWS Settings
     AWS_ACCESS_KEY_ID: Optional[str] = None
@@ -1,7 +1,12 @@
-from typing import List, Optional
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from typing import List, Optional, Tuple
+from email.message import EmailMessage
+from email.policy import SMTP
+from email.utils import formataddr, formatdate, make_msgid
 from pydantic import EmailStr, BaseModel
 from app.core.config import settings
+from app.core.smtp_pool import smtp_pool, PooledConnection
+from app.core.send_guard import SendPausedError
+from app.core.templates import email_templates
 import ssl
 import logging
 import traceback
@@ -40,117 +45,148 @@ logger.info(f"MAIL_STARTTLS: {settings.MAIL_TLS}")
 logger.info(f"USE_CREDENTIALS: {settings.USE_CREDENTIALS}")
 logger.info(f"VALIDATE_CERTS: {settings.VALIDATE_CERTS}")
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-    MAIL_SSL_TLS=settings.MAIL_SSL,
-    MAIL_STARTTLS=settings.MAIL_TLS,
-    USE_CREDENTIALS=settings.USE_CREDENTIALS,
-    VALIDATE_CERTS=settings.VALIDATE_CERTS,
-    TEMPLATE_FOLDER=None
-)
+def send_time_headers() -> bytes:
+    """Date and Message-ID headers, which must be fresh for every send"""
+    return (
+        f"Date: {formatdate(localtime=True)}\r\n"
+        f"Message-ID: {make_msgid(domain=settings.MAIL_FROM.split('@')[-1])}\r\n"
+    ).encode("ascii")
+
+def build_email_message(email: EmailSchema, stamp: bool = True) -> EmailMessage:
+    """
+    Build the MIME message for an email: plain text, plus an HTML alternative if given.
+    With stamp=False the Date and Message-ID headers are left out.
+    """
+    message = EmailMessage()
+    message["Subject"] = email.subject
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = ", ".join(email.email)
+    if stamp:
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid(domain=settings.MAIL_FROM.split("@")[-1])
+    message.set_content(email.body)
+    if email.html:
+        message.add_alternative(email.html, subtype="html")
+    return message
 
-async def send_email(email: EmailSchema) -> bool:
+def render_email_payload(email: EmailSchema) -> bytes:
+    """
+    Serialise an email ahead of time. send_prerendered_email adds the Date and
+    Message-ID headers when it goes out.
     """
-    Send an email using FastAPI-Mail
+    return build_email_message(email, stamp=False).as_bytes(policy=SMTP)
+
+async def send_email(email: EmailSchema, connection: Optional[PooledConnection] = None) -> bool:
+    """
+    Send an email over a pooled SMTP connection, or over connection if the
+    caller already holds one for a group of sends. Sends go through send_guard,
+    so they wait while the SMTP server is overloaded or failing; one held back
+    for too long raises SendPausedError, as it was never attempted.
     """
     try:
         logger.info(f"Attempting to send email to {email.email}")
-        logger.info(f"Using SMTP server: {settings.MAIL_SERVER}:{settings.MAIL_PORT}")
-        
-        message = MessageSchema(
-            subject=email.subject,
-            recipients=email.email,
-            body=email.body,
-            html=email.html or email.body,
-            subtype=MessageType.html if email.html else MessageType.plain
-        )
-        
-        fm = FastMail(conf)
-        await fm.send_message(message)
+        await smtp_pool.send_message(build_email_message(email), connection)
         logger.info(f"Email sent successfully to {email.email}")
         return True
+    except SendPausedError as e:
+        logger.warning(f"Email to {email.email} not sent: {str(e)}")
+        raise
     except Exception as e:
         logger.error(f"Error sending email: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         return False
 
-async def send_message_delivery_notification(
+NOTIFICATION_SUBJECTS = {
+    "delivery_notification": "Your AfterLife Message '{message_title}' has been delivered",
+    "scheduled_notification": "Your AfterLife Message '{message_title}' has been scheduled",
+}
+
+def build_notification_email(
+    template: str,
     recipient_email: str,
     message_title: str,
     delivery_date: str
-) -> bool:
+) -> EmailSchema:
     """
-    Send a notification email when a message is delivered
+    Render one of the notification emails in NOTIFICATION_SUBJECTS
     """
-    subject = f"Your AfterLife Message '{message_title}' has been delivered"
-    body = f"""
-    Dear {recipient_email},
-
-    Your AfterLife Message "{message_title}" has been delivered as scheduled on {delivery_date}.
+    rendered = email_templates.render(
+        template,
+        recipient_email=recipient_email,
+        message_title=message_title,
+        delivery_date=delivery_date
+    )
+    return EmailSchema(
+        email=[recipient_email],
+        subject=NOTIFICATION_SUBJECTS[template].format(message_title=message_title),
+        body=rendered.text,
+        html=rendered.html
+    )
 
-    Best regards,
-    The AfterLife Team
-    """
-    
-    html = f"""
-    <html>
-        <body>
-            <h2>Message Delivered</h2>
-            <p>Dear {recipient_email},</p>
-            <p>Your AfterLife Message "<strong>{message_title}</strong>" has been delivered as scheduled on {delivery_date}.</p>
-            <p>Best regards,<br>The AfterLife Team</p>
-        </body>
-    </html>
-    """
-    
-    email_schema = EmailSchema(
+def build_scheduled_summary_email(recipient_email: str, messages: List[Tuple[str, str]]) -> EmailSchema:
+    """
+    Render one notification covering several scheduled messages, given as
+    (title, delivery date) pairs
+    """
+    rendered = email_templates.render(
+        "scheduled_summary",
+        recipient_email=recipient_email,
+        messages=messages
+    )
+    return EmailSchema(
         email=[recipient_email],
-        subject=subject,
-        body=body,
-        html=html
+        subject=f"{len(messages)} of your AfterLife Messages have been scheduled",
+        body=rendered.text,
+        html=rendered.html
     )
-    
-    return await send_email(email_schema)
 
-async def send_message_scheduled_notification(
+async def send_prerendered_email(
+    recipient_email: str,
+    payload: bytes,
+    connection: Optional[PooledConnection] = None
+) -> bool:
+    """
+    Send a payload made by render_email_payload, like send_email
+    """
+    try:
+        logger.info(f"Attempting to send pre-rendered email to {recipient_email}")
+        await smtp_pool.send_raw(settings.MAIL_FROM, [recipient_email], send_time_headers() + payload, connection)
+        logger.info(f"Email sent successfully to {recipient_email}")
+        return True
+    except SendPausedError as e:
+        logger.warning(f"Email to {recipient_email} not sent: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error sending email: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return False
+
+async def send_message_delivery_notification(
     recipient_email: str,
     message_title: str,
     delivery_date: str
 ) -> bool:
     """
-    Send a notification email when a message is scheduled for delivery
+    Send a notification email when a message is delivered, returning False if it was not sent, held back by send_guard included
     """
-    subject = f"Your AfterLife Message '{message_title}' has been scheduled"
-    body = f"""
-    Dear {recipient_email},
-
-    Your AfterLife Message "{message_title}" has been scheduled for delivery on {delivery_date}.
+    try:
+        return await send_email(build_notification_email(
+            "delivery_notification", recipient_email, message_title, delivery_date
+        ))
+    except SendPausedError:
+        return False
 
-    Best regards,
-    The AfterLife Team
-    """
-    
-    html = f"""
-    <html>
-        <body>
-            <h2>Message Scheduled</h2>
-            <p>Dear {recipient_email},</p>
-            <p>Your AfterLife Message "<strong>{message_title}</strong>" has been scheduled for delivery on {delivery_date}.</p>
-            <p>Best regards,<br>The AfterLife Team</p>
-        </body>
-    </html>
-    """
-    
-    email_schema = EmailSchema(
-        email=[recipient_email],
-        subject=subject,
-        body=body,
-        html=html
-    )
-    
-    return await send_email(email_schema) 
\ No newline at end of file
+async def send_message_scheduled_notification(
+    recipient_email: str,
+    message_title: str,
+    delivery_date: str
+) -> bool:
+    """
+    Send a notification email when a message is scheduled for delivery, returning False if it was not sent, held back by send_guard included
+    """
+    try:
+        return await send_email(build_notification_email(
+            "scheduled_notification", recipient_email, message_title, delivery_date
+        ))
+    except SendPausedError:
+        return False
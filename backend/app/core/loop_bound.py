@@ -0,0 +1,24 @@
+import asyncio
+from typing import Optional
+
+class LoopBound:
+    """
+    Base for long-lived objects that hold asyncio primitives.
+
+    Locks, semaphores and connections belong to the event loop they were
+    made on, while these objects are module singletons that outlive any one
+    loop, e.g. across the asyncio.run() calls of a script. Subclasses make
+    their loop state in _reset_for_loop and call _bind_to_running_loop before
+    using it; the state is made again whenever the running loop changes.
+    """
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _reset_for_loop(self):
+        raise NotImplementedError
+
+    def _bind_to_running_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._reset_for_loop()
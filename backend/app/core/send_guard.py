@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+import aiosmtplib
+from app.core.config import settings
+from app.core.loop_bound import LoopBound
+
+logger = logging.getLogger(__name__)
+
+# Rejections of a single sender or recipient say nothing about the server's health
+RECIPIENT_ERRORS = (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPSenderRefused)
+
+class SendPausedError(Exception):
+    """Raised instead of sending when the send guard held a send back for too long"""
+
+class CircuitOpenError(SendPausedError):
+    """Raised instead of sending while the circuit breaker keeps the SMTP server paused"""
+
+class AdaptiveLimiter(LoopBound):
+    """
+    AIMD concurrency limit for outbound sends.
+
+    Every send that succeeds within latency_target raises the limit by
+    1/limit, about one extra concurrent send per round of sends. A failure or
+    a slow send multiplies it by backoff, at most once per cooldown so a burst
+    of failures from the same moment counts once.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, latency_target: float, backoff: float):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.latency = 0.0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _reset_for_loop(self):
+        self._condition = asyncio.Condition()
+        self.in_flight = 0
+
+    async def acquire(self, timeout: float):
+        """
+        Wait for a free slot, raising SendPausedError after timeout seconds
+        """
+        self._bind_to_running_loop()
+        async with self._condition:
+            try:
+                await asyncio.wait_for(self._condition.wait_for(lambda: self.in_flight < int(self.limit)), timeout)
+            except asyncio.TimeoutError:
+                raise SendPausedError(f"No SMTP send slot became free within {timeout}s")
+            self.in_flight += 1
+
+    async def release(self, latency: float, ok: bool):
+        self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+        if ok and latency <= self.latency_target:
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+        elif time.monotonic() - self._last_decrease > max(self.latency, self.latency_target):
+            self.limit = max(self.limit * self.backoff, self.min_limit)
+            self._last_decrease = time.monotonic()
+            logger.warning(f"SMTP {'slow' if ok else 'failing'}, concurrency limit lowered to {int(self.limit)}")
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+class CircuitBreaker:
+    """
+    Stops sending while the SMTP server is failing.
+
+    The breaker opens when at least min_calls of the last window sends were
+    made and error_rate of them failed. While open, sends wait; after
+    open_seconds it lets a single probe through (half-open). A successful probe
+    closes it again, a failed one reopens it.
+    """
+
+    def __init__(self, window: int, error_rate: float, min_calls: int, open_seconds: float):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=window)
+        self._probing = False
+
+    @property
+    def recent_error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    @property
+    def open_remaining(self) -> float:
+        """Seconds until an open breaker lets a probe through, 0 if it does not hold sends back"""
+        if self.state != "open":
+            return 0.0
+        return max(self.opened_at + self.open_seconds - time.monotonic(), 0.0)
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        logger.error(f"SMTP circuit breaker opened, pausing sends for {self.open_seconds}s")
+
+    async def before_call(self, max_wait: float) -> bool:
+        """
+        Wait until a send may go ahead, raising CircuitOpenError after max_wait
+        seconds. Returns True if the send is the half-open probe.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = "half_open"
+            if self.state == "closed":
+                return False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                logger.info("SMTP circuit breaker half-open, sending a probe")
+                return True
+            if time.monotonic() >= deadline:
+                raise CircuitOpenError("SMTP sending is paused by the circuit breaker")
+            await asyncio.sleep(min(0.5, max(deadline - time.monotonic(), 0)))
+
+    def abandon_probe(self):
+        """The probe was never sent; let the next send probe instead"""
+        self._probing = False
+
+    def record(self, ok: bool, probe: bool = False):
+        if probe:
+            self._probing = False
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+                logger.info("SMTP circuit breaker closed")
+            else:
+                self._open()
+            return
+        if self.state != "closed":
+            return
+        self._outcomes.append(ok)
+        if len(self._outcomes) >= self.min_calls and self.recent_error_rate >= self.error_rate:
+            self._open()
+
+class SendGuard:
+    """Adaptive concurrency limit and circuit breaker around every SMTP send"""
+
+    def __init__(self):
+        self.limiter = AdaptiveLimiter(
+            min_limit=settings.SMTP_ADAPTIVE_MIN_CONCURRENCY,
+            max_limit=settings.SMTP_ADAPTIVE_MAX_CONCURRENCY,
+            latency_target=settings.SMTP_LATENCY_TARGET_SECONDS,
+            backoff=settings.SMTP_BACKOFF_FACTOR,
+        )
+        self.breaker = CircuitBreaker(
+            window=settings.SMTP_BREAKER_WINDOW,
+            error_rate=settings.SMTP_BREAKER_ERROR_RATE,
+            min_calls=settings.SMTP_BREAKER_MIN_CALLS,
+            open_seconds=settings.SMTP_BREAKER_OPEN_SECONDS,
+        )
+
+    @asynccontextmanager
+    async def call(self):
+        """
+        Wrap one send; waits while the breaker is open or the limit is reached.
+        Callers must already hold their SMTP connection, see SMTPConnectionPool._send.
+        """
+        probe = await self.breaker.before_call(settings.SMTP_BREAKER_MAX_WAIT_SECONDS)
+        try:
+            await self.limiter.acquire(settings.SMTP_SLOT_WAIT_SECONDS)
+        except BaseException:
+            if probe:
+                self.breaker.abandon_probe()
+            raise
+        ok = False
+        started = time.monotonic()
+        try:
+            yield
+            ok = True
+        except RECIPIENT_ERRORS:
+            ok = True
+            raise
+        finally:
+            await self.limiter.release(time.monotonic() - started, ok)
+            self.breaker.record(ok, probe)
+
+    def status(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "error_rate": round(self.breaker.recent_error_rate, 3),
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "latency_seconds": round(self.limiter.latency, 3),
+        }
+
+send_guard = SendGuard()
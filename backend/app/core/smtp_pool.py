@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from typing import Awaitable, Callable, List, Optional
+import aiosmtplib
+from app.core.config import settings
+from app.core.loop_bound import LoopBound
+from app.core.send_guard import send_guard
+
+logger = logging.getLogger(__name__)
+
+class PooledConnection:
+    """An authenticated SMTP session plus the bookkeeping the pool needs"""
+
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    async def close(self):
+        try:
+            if self.smtp.is_connected:
+                await self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+class SMTPConnectionPool(LoopBound):
+    """
+    Pool of persistent, authenticated SMTP connections.
+
+    Connections are reused across sends instead of paying for a TCP connect,
+    TLS handshake and login per email. A connection is retired when it has been
+    idle for longer than idle_timeout or has sent max_messages_per_connection
+    messages, and one that has been idle for health_check_interval is probed
+    with NOOP before reuse. At most pool_size connections are open at once;
+    callers beyond that wait for a free connection.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+        pool_size: int = 10,
+        idle_timeout: float = 60,
+        max_messages_per_connection: int = 100,
+        health_check_interval: float = 15,
+        timeout: float = 30,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle: List[PooledConnection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _reset_for_loop(self):
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(self.pool_size)
+
+    async def _open(self) -> PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        self.connections_opened += 1
+        logger.info(f"Opened SMTP connection to {self.hostname}:{self.port} ({self.connections_opened} opened so far)")
+        return PooledConnection(smtp)
+
+    async def _is_reusable(self, conn: PooledConnection) -> bool:
+        if not conn.smtp.is_connected:
+            return False
+        if conn.idle_seconds > self.idle_timeout:
+            return False
+        if conn.messages_sent >= self.max_messages_per_connection:
+            return False
+        if conn.idle_seconds > self.health_check_interval:
+            try:
+                await conn.smtp.noop()
+            except aiosmtplib.SMTPException:
+                return False
+        return True
+
+    async def _checkout(self) -> PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            if await self._is_reusable(conn):
+                return conn
+            await conn.close()
+        return await self._open()
+
+    @asynccontextmanager
+    async def connection(self):
+        """
+        Borrow a connection for one or more sends. It goes back to the pool
+        afterwards unless an error left it in an unknown state.
+        """
+        self._bind_to_running_loop()
+        async with self._semaphore:
+            conn = await self._checkout()
+            try:
+                yield conn
+            except Exception:
+                await conn.close()
+                raise
+            conn.last_used = time.monotonic()
+            if conn.messages_sent >= self.max_messages_per_connection:
+                await conn.close()
+            else:
+                self._idle.append(conn)
+
+    async def _send(self, send: Callable[[aiosmtplib.SMTP], Awaitable], conn: Optional[PooledConnection] = None):
+        if conn is None:
+            async with self.connection() as pooled:
+                await self._send(send, pooled)
+            return
+
+        # Always taken after the connection: a send holding a send guard slot
+        # while it waits for a connection could deadlock with one doing the reverse
+        async with send_guard.call():
+            try:
+                await send(conn.smtp)
+            except aiosmtplib.SMTPServerDisconnected:
+                logger.warning("SMTP connection was dropped by the server, reconnecting")
+                await conn.close()
+                conn.smtp = (await self._open()).smtp
+                conn.messages_sent = 0
+                await send(conn.smtp)
+        conn.messages_sent += 1
+
+    async def send_message(self, message: EmailMessage, conn: Optional[PooledConnection] = None):
+        """
+        Send a message over a pooled connection, or over conn if one is already held.
+        A connection the server dropped while idle is replaced once. Sends go
+        through send_guard, so they wait while the SMTP server is overloaded or failing.
+        """
+        await self._send(lambda smtp: smtp.send_message(message), conn)
+
+    async def send_raw(self, sender: str, recipients: List[str], data: bytes, conn: Optional[PooledConnection] = None):
+        """
+        Send an already serialised message, like send_message
+        """
+        await self._send(lambda smtp: smtp.sendmail(sender, recipients, data), conn)
+
+    async def close(self):
+        """Close every idle connection"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await conn.close()
+
+smtp_pool = SMTPConnectionPool(
+    hostname=settings.MAIL_SERVER,
+    port=settings.MAIL_PORT,
+    username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+    password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+    use_tls=settings.MAIL_SSL,
+    start_tls=settings.MAIL_TLS,
+    validate_certs=settings.VALIDATE_CERTS,
+    pool_size=settings.SMTP_POOL_SIZE,
+    idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT_SECONDS,
+    max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+    health_check_interval=settings.SMTP_HEALTH_CHECK_SECONDS,
+    timeout=settings.SMTP_TIMEOUT_SECONDS,
+)
@@ -1,28 +1,63 @@
-from typing import List
-from fastapi import BackgroundTasks
-from app.core.email import send_email, EmailSchema
-from app.core.config import settings
+import asyncio
+from typing import List, Tuple
+from app.core.email import build_notification_email, EmailSchema
+from app.db.session import SessionLocal
+from app.services.job_queue import enqueue_jobs
+from app.services import job_handlers  # noqa: F401  (registers the email.send job kind)
+
+def _enqueue_emails(payloads: List[dict]) -> None:
+    db = SessionLocal()
+    try:
+        enqueue_jobs(db, "email.send", payloads)
+    finally:
+        db.close()
+
+async def send_emails_background(emails: List[EmailSchema]) -> None:
+    """
+    Send single-recipient emails in the background, queued as email.send jobs
+    for the job workers in one transaction
+    """
+    if not emails:
+        return
+    await asyncio.to_thread(_enqueue_emails, [
+        {
+            "email_to": email.email[0],
+            "subject": email.subject,
+            "body": email.body,
+            "html": email.html
+        }
+        for email in emails
+    ])
 
 async def send_email_background(
-    background_tasks: BackgroundTasks,
     email_to: str,
     subject: str,
     body: str,
     html: str = None
 ) -> None:
     """
-    Send an email in the background
+    Send an email in the background, as an email.send job for the job workers
+    """
+    await send_emails_background([EmailSchema(email=[email_to], subject=subject, body=body, html=html)])
+
+async def send_notification_background(
+    template: str,
+    recipient_email: str,
+    message_title: str,
+    delivery_date: str
+) -> None:
+    """
+    Render a notification email now and send it in the background
     """
-    email_schema = EmailSchema(
-        email=[email_to],
-        subject=subject,
-        body=body,
-        html=html
+    email_schema = build_notification_email(template, recipient_email, message_title, delivery_date)
+    await send_email_background(
+        email_to=recipient_email,
+        subject=email_schema.subject,
+        body=email_schema.body,
+        html=email_schema.html
     )
-    background_tasks.add_task(send_email, email_schema)
 
 async def send_message_delivery_notification_background(
-    background_tasks: BackgroundTasks,
     recipient_email: str,
     message_title: str,
     delivery_date: str
@@ -30,37 +65,19 @@ async def send_message_delivery_notification_background(
     """
     Send a delivery notification email in the background
     """
-    subject = f"Your AfterLife Message '{message_title}' has been delivered"
-    body = f"""
-    Dear {recipient_email},
-
-    Your AfterLife Message "{message_title}" has been delivered as scheduled on {delivery_date}.
+    await send_notification_background("delivery_notification", recipient_email, message_title, delivery_date)
 
-    Best regards,
-    The AfterLife Team
+async def send_message_delivery_notifications_background(notifications: List[Tuple[str, str, str]]) -> None:
     """
-    
-    html = f"""
-    <html>
-        <body>
-            <h2>Message Delivered</h2>
-            <p>Dear {recipient_email},</p>
-            <p>Your AfterLife Message "<strong>{message_title}</strong>" has been delivered as scheduled on {delivery_date}.</p>
-            <p>Best regards,<br>The AfterLife Team</p>
-        </body>
-    </html>
+    Send delivery notification emails in the background, given as
+    (recipient email, message title, delivery date) tuples
     """
-    
-    await send_email_background(
-        background_tasks=background_tasks,
-        email_to=recipient_email,
-        subject=subject,
-        body=body,
-        html=html
-    )
+    await send_emails_background([
+        build_notification_email("delivery_notification", recipient_email, message_title, delivery_date)
+        for recipient_email, message_title, delivery_date in notifications
+    ])
 
 async def send_message_scheduled_notification_background(
-    background_tasks: BackgroundTasks,
     recipient_email: str,
     message_title: str,
     delivery_date: str
@@ -68,31 +85,4 @@ async def send_message_scheduled_notification_background(
     """
     Send a scheduled delivery notification email in the background
     """
-    subject = f"Your AfterLife Message '{message_title}' has been scheduled"
-    body = f"""
-    Dear {recipient_email},
-
-    Your AfterLife Message "{message_title}" has been scheduled for delivery on {delivery_date}.
-
-    Best regards,
-    The AfterLife Team
-    """
-    
-    html = f"""
-    <html>
-        <body>
-            <h2>Message Scheduled</h2>
-            <p>Dear {recipient_email},</p>
-            <p>Your AfterLife Message "<strong>{message_title}</strong>" has been scheduled for delivery on {delivery_date}.</p>
-            <p>Best regards,<br>The AfterLife Team</p>
-        </body>
-    </html>
-    """
-    
-    await send_email_background(
-        background_tasks=background_tasks,
-        email_to=recipient_email,
-        subject=subject,
-        body=body,
-        html=html
-    ) 
\ No newline at end of file
+    await send_notification_background("scheduled_notification", recipient_email, message_title, delivery_date)
@@ -0,0 +1,52 @@
+import os
+from typing import Dict, NamedTuple
+from jinja2 import Environment, FileSystemLoader, Template
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+class RenderedEmail(NamedTuple):
+    text: str
+    html: str
+
+class EmailTemplates:
+    """
+    Compiled email templates, loaded once and kept in memory.
+
+    Every email is a pair of templates, <name>.txt for the plain-text part and
+    <name>.html for the HTML part. All pairs in the template directory are
+    compiled when this is created, so rendering never touches the filesystem.
+    HTML templates auto-escape their context; text templates do not, since
+    escaping would only garble the plain-text part.
+    """
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR):
+        loader = FileSystemLoader(template_dir)
+        html_env = Environment(loader=loader, autoescape=True, auto_reload=False)
+        text_env = Environment(
+            loader=loader,
+            autoescape=False,
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        self._templates: Dict[str, Dict[str, Template]] = {}
+        for filename in sorted(os.listdir(template_dir)):
+            name, ext = os.path.splitext(filename)
+            if ext == ".html":
+                self._templates.setdefault(name, {})["html"] = html_env.get_template(filename)
+            elif ext == ".txt":
+                self._templates.setdefault(name, {})["text"] = text_env.get_template(filename)
+        for name, parts in self._templates.items():
+            if set(parts) != {"html", "text"}:
+                raise RuntimeError(f"Email template '{name}' needs both {name}.txt and {name}.html")
+
+    @property
+    def names(self):
+        return sorted(self._templates)
+
+    def render(self, name: str, **context) -> RenderedEmail:
+        """Render the plain-text and HTML parts of the named email"""
+        parts = self._templates[name]
+        return RenderedEmail(text=parts["text"].render(**context), html=parts["html"].render(**context))
+
+email_templates = EmailTemplates()
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.loop_bound import LoopBound
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, holding at most capacity tokens"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class DomainThrottle(LoopBound):
+    """
+    Per recipient domain send limits.
+
+    Every domain gets a token bucket for its send rate and a semaphore for the
+    number of SMTP sessions sending to it at once. Limits come from
+    DOMAIN_LIMITS for listed domains and from the DOMAIN_* defaults otherwise.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self.limits = {domain.lower(): limit for domain, limit in (limits or {}).items()}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _limit(self, domain: str, name: str, default: float) -> float:
+        return self.limits.get(domain, {}).get(name, default)
+
+    def _reset_for_loop(self):
+        self._slots = {}
+
+    async def acquire(self, domain: str):
+        """Wait until the domain's rate limit allows one more message"""
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = self._buckets[domain] = TokenBucket(
+                rate=self._limit(domain, "rate", settings.DOMAIN_RATE_PER_SECOND),
+                capacity=self._limit(domain, "burst", settings.DOMAIN_BURST),
+            )
+        await bucket.acquire()
+
+    @asynccontextmanager
+    async def session_slot(self, domain: str):
+        """Hold one of the domain's concurrent SMTP session slots"""
+        self._bind_to_running_loop()
+        slot = self._slots.get(domain)
+        if slot is None:
+            slot = self._slots[domain] = asyncio.Semaphore(
+                int(self._limit(domain, "concurrency", settings.DOMAIN_MAX_CONCURRENCY))
+            )
+        async with slot:
+            yield
+
+def recipient_domain(email: str) -> str:
+    return email.rsplit("@", 1)[-1].lower()
+
+domain_throttle = DomainThrottle(settings.DOMAIN_LIMITS)
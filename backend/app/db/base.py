@@ -1,4 +1,6 @@
 # Import all the models, so that Base has them before being imported by Alembic
 from app.db.base_class import Base  # noqa
 from app.models.user import User  # noqa
-from app.models.message import Message  # noqa 
\ No newline at end of file
+from app.models.message import Message  # noqa
+from app.models.scheduler_lease import SchedulerLease  # noqa
+from app.models.job import Job  # noqa
\ No newline at end of file
@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, literal, text
 from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.db.session import engine
@@ -5,9 +6,38 @@ from app.db.base import Base
 from app.models.user import User
 from app.core.security import get_password_hash
 
+def sync_schema() -> None:
+    """
+    Create missing tables, then add the columns and indexes that create_all()
+    skips on tables that already exist
+    """
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=engine.dialect)}'
+                if column.default is not None and column.default.is_scalar:
+                    default = literal(column.default.arg, column.type).compile(
+                        dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                    )
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+
 def init_db(db: Session) -> None:
     # Create all tables
-    Base.metadata.create_all(bind=engine)
+    sync_schema()
     
     # Create first superuser if it doesn't exist
     user = db.query(User).filter(User.email == "admin@afterlife.com").first()
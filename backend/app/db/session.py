@@ -1,7 +1,37 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
+# Dialects that can skip rows locked by other workers while claiming
+SKIP_LOCKED_DIALECTS = {"postgresql", "mysql", "oracle"}
+
+# Async driver used for each database when SQLALCHEMY_ASYNC_DATABASE_URI is not set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",  # Needs asyncpg installed
+}
+
+def async_database_uri(uri: str) -> str:
+    """
+    Swap the driver of a database URI for its async counterpart
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}', set SQLALCHEMY_ASYNC_DATABASE_URI")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def async_engine_options(uri: str) -> dict:
+    if make_url(uri).get_backend_name() == "sqlite":
+        # aiosqlite opens a connection per checkout by default, and many short-lived
+        # connections writing at once fail with "database is locked"; a few
+        # long-lived ones queue for the file lock instead
+        return {"poolclass": AsyncAdaptedQueuePool, "pool_size": 5, "max_overflow": 0}
+    return {}
+
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     pool_pre_ping=True,
@@ -10,9 +40,21 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URI = settings.SQLALCHEMY_ASYNC_DATABASE_URI or async_database_uri(settings.SQLALCHEMY_DATABASE_URI)
+
+# Dispose of it before the event loop closes, pooled connections keep the process alive otherwise
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URI,
+    pool_pre_ping=True,
+    **async_engine_options(ASYNC_DATABASE_URI)
+)
+
+# Objects stay loaded after commit, attributes cannot be lazy-loaded on an AsyncSession
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
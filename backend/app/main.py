@@ -6,13 +6,17 @@ from typing import Optional
 import uvicorn
 import asyncio
 import logging
+from app.api.pagination import NEXT_CURSOR_HEADER
 from app.api.v1.endpoints import login, users, messages, test
 from app.core.config import settings
 from app.core.security import create_access_token
-from app.db.session import engine
-from app.db.base import Base
+from app.core.smtp_pool import smtp_pool
+from app.core.send_guard import send_guard
+from app.db.session import async_engine
+from app.db.init_db import sync_schema
 from app.api.v1.api import api_router
-from app.services.scheduler import start_scheduler, check_and_deliver_messages
+from app.services.scheduler import start_scheduler
+from app.services.job_queue import JobWorker
 
 # Set up logging with more detailed format
 logging.basicConfig(
@@ -21,9 +25,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="AfterLife Message Platform",
     description="A secure platform for creating and delivering messages to loved ones after passing away",
@@ -37,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Lets browsers read the pagination cursor
 )
 
 # Include routers
@@ -57,24 +59,47 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat()
+        "status": "healthy" if send_guard.breaker.state == "closed" else "degraded",
+        "timestamp": datetime.utcnow().isoformat(),
+        "smtp": send_guard.status()
     }
 
 @app.on_event("startup")
 async def startup_event():
     """
-    Start the message scheduler when the application starts if enabled
+    Bring the schema up to date if SYNC_SCHEMA_ON_STARTUP is set, then start a
+    job worker for JOB_APP_WORKER_LANES, and the message scheduler if enabled.
+    Every worker competes for the scheduler lease; only the holder delivers.
     """
+    if settings.SYNC_SCHEMA_ON_STARTUP:
+        sync_schema()
+    if settings.JOB_APP_WORKER_LANES:
+        app.state.job_worker_task = asyncio.create_task(JobWorker(lanes=settings.JOB_APP_WORKER_LANES).run())
     if settings.SCHEDULER_ENABLED:
         logger.info("Starting message scheduler...")
         # Create a task to run the scheduler
-        asyncio.create_task(start_scheduler())
-        # Also check for messages immediately on startup
-        asyncio.create_task(check_and_deliver_messages())
+        app.state.scheduler_task = asyncio.create_task(start_scheduler())
         logger.info("Message scheduler started successfully")
     else:
         logger.info("Message scheduler is disabled")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Stop the scheduler, releasing its lease so another instance takes over at once,
+    stop the job worker, handing its running jobs back to the queue, and close
+    pooled SMTP and database connections
+    """
+    scheduler_task = getattr(app.state, "scheduler_task", None)
+    if scheduler_task:
+        scheduler_task.cancel()
+        await asyncio.gather(scheduler_task, return_exceptions=True)
+    job_worker_task = getattr(app.state, "job_worker_task", None)
+    if job_worker_task:
+        job_worker_task.cancel()
+        await asyncio.gather(job_worker_task, return_exceptions=True)
+    await smtp_pool.close()
+    await async_engine.dispose()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
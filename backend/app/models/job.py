@@ -0,0 +1,32 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import String, DateTime, JSON, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base_class import Base
+
+class Job(Base):
+    __tablename__ = "job"
+    __table_args__ = (
+        # Serves the worker's claim query: runnable jobs by priority, then age
+        Index("ix_job_runnable", "status", "priority", "run_after"),
+        # At most one queued job per dedupe key; later work is merged into it
+        Index("ix_job_dedupe", "dedupe_key", unique=True),
+    )
+    
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    lane: Mapped[str] = mapped_column(String, nullable=False, default="default")
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    dedupe_key: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Cleared once the job is claimed
+    
+    # queued -> running -> done, or back to queued after a failure until dead
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued")
+    run_after: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=5)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    
+    # Visibility timeout: a running job whose lock expired is handed out again
+    locked_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    locked_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
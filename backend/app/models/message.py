@@ -1,11 +1,25 @@
 from typing import Optional
 from datetime import datetime
-from sqlalchemy import Boolean, String, ForeignKey, DateTime, JSON, Integer
+from sqlalchemy import Boolean, String, ForeignKey, DateTime, JSON, Integer, Index, LargeBinary
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base_class import Base
 
 class Message(Base):
     __tablename__ = "message"
+    __table_args__ = (
+        # Serves the scheduler's due-query: undelivered rows ordered by delivery date
+        Index("ix_message_due", "is_delivered", "delivery_date"),
+        # Lets the delivery timer find retries that become eligible inside its window
+        Index("ix_message_retry", "next_attempt_at"),
+        # Backs the drain-rate estimate in the scheduler status report
+        Index("ix_message_delivered_at", "delivered_at"),
+        # Keyset pagination of a user's messages in delivery order
+        Index("ix_message_user_delivery", "user_id", "delivery_date", "id"),
+        # Lets the delivery timer find messages written by other processes
+        Index("ix_message_updated_at", "updated_at"),
+        # Counts each sender's claims in the current quota interval
+        Index("ix_message_claimed_at", "claimed_at", "user_id"),
+    )
     
     title: Mapped[str] = mapped_column(String, nullable=False)
     content: Mapped[str] = mapped_column(String, nullable=False)
@@ -14,10 +28,26 @@ class Message(Base):
     # Delivery settings
     delivery_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     is_delivered: Mapped[bool] = mapped_column(Boolean, default=False)
+    delivered_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     delivery_method: Mapped[str] = mapped_column(String)
     recipient_email: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     recipient_phone: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     
+    # MIME payload rendered when the message is saved, sent as-is on delivery.
+    # Deferred: only the scheduler reads it, and it selects the column explicitly.
+    rendered_email: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True, deferred=True)
+    
+    # Delivery claim held by a scheduler worker while it sends the message
+    claimed_by: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    claimed_until: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    claimed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # Counts against the sender quota
+    
+    # Retry state for failed deliveries
+    attempt_count: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    is_dead_lettered: Mapped[bool] = mapped_column(Boolean, default=False)
+    
     # AI generation settings
     personality_profile: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     generation_settings: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
@@ -0,0 +1,13 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.base_class import Base
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_lease"
+    
+    name: Mapped[str] = mapped_column(String, unique=True, nullable=False)
+    holder: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -1,10 +1,14 @@
 from typing import Optional, List
-from sqlalchemy import String, Boolean, Integer
+from sqlalchemy import String, Boolean, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base_class import Base
 
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        # Keyset pagination of the user list in sign-up order
+        Index("ix_user_created", "created_at", "id"),
+    )
     
     email: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
     hashed_password: Mapped[str] = mapped_column(String, nullable=False)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Literal, Optional, List, Dict
 from pydantic import BaseModel, EmailStr
 from app.schemas.base import BaseSchema
 
@@ -29,10 +29,22 @@ class MessageUpdate(BaseModel):
     generation_settings: Optional[Dict] = None
     is_delivered: Optional[bool] = None
 
+class MessageBulkUpdate(MessageUpdate):
+    id: int
+
+class MessageIds(BaseModel):
+    ids: List[int]
+
+class BulkItemResult(BaseModel):
+    index: int  # Position of the item in the request
+    id: Optional[int] = None
+    status: Literal["created", "updated", "deleted", "not_found"]
+
 class MessageInDBBase(MessageBase, BaseSchema):
     id: Optional[int] = None
     user_id: int
     is_delivered: bool = False
+    delivered_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
@@ -41,4 +53,18 @@ class Message(MessageInDBBase):
     pass
 
 class MessageInDB(MessageInDBBase):
-    pass 
\ No newline at end of file
+    pass
+
+class MessageSummary(BaseModel):
+    """Message without its content and generation data, for overviews of many messages"""
+    id: int
+    title: str
+    delivery_date: datetime
+    delivery_method: str
+    recipient_email: Optional[str] = None
+    recipient_phone: Optional[str] = None
+    is_delivered: bool = False
+    delivered_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True 
\ No newline at end of file
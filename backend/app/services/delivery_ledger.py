@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import AsyncSessionLocal
+from app.models.message import Message
+from app.core.config import settings
+from app.core.loop_bound import LoopBound
+from app.services.delivery_timer import ist_now
+
+logger = logging.getLogger(__name__)
+
+class DeliveryLedger(LoopBound):
+    """
+    Collects delivery outcomes and writes them to the database in batches.
+
+    Successful sends are appended to a per-worker journal file before they are
+    buffered, so a worker that crashes between sending and flushing does not lose
+    track of what it sent. Before claiming new work every worker replays all
+    journals it can see, marking those messages delivered, so a reclaimed message
+    that was already sent is never sent again.
+    """
+
+    def __init__(self, worker_id: str, journal_dir: Optional[str] = None):
+        self.journal_dir = Path(journal_dir or settings.DELIVERY_JOURNAL_DIR)
+        self.journal_path = self.journal_dir / f"{worker_id.replace(':', '_')}.journal"
+        self._delivered: Dict[int, datetime] = {}
+        self._failed: List[dict] = []
+        self._journal = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def _reset_for_loop(self):
+        self._flush_lock = asyncio.Lock()
+
+    def _append_to_journal(self, message_id: int):
+        if self._journal is None:
+            self.journal_dir.mkdir(parents=True, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(f"{message_id}\n")
+        # Hand the line to the OS so it survives a crash of this process
+        self._journal.flush()
+
+    async def record_delivered(self, message_id: int, delivered_at: datetime, db: Optional[AsyncSession] = None):
+        """
+        Record a sent message, flushing if the buffer reached DELIVERY_FLUSH_SIZE
+        """
+        self._append_to_journal(message_id)
+        self._delivered[message_id] = delivered_at
+        if self.pending_count >= settings.DELIVERY_FLUSH_SIZE:
+            await self.flush(db)
+
+    async def record_failed(self, message_id: int, claim_token: str, values: dict, db: Optional[AsyncSession] = None):
+        """
+        Record a failed attempt; values are the retry columns to write for it
+        """
+        self._failed.append({
+            "b_id": message_id,
+            "b_claimed_by": claim_token,
+            **{f"b_{column}": value for column, value in values.items()},
+        })
+        if self.pending_count >= settings.DELIVERY_FLUSH_SIZE:
+            await self.flush(db)
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._delivered) + len(self._failed)
+
+    async def flush(self, db: Optional[AsyncSession] = None):
+        """
+        Write all buffered outcomes in a single transaction and clear the journal
+        """
+        if not self.pending_count:
+            return
+        self._bind_to_running_loop()
+        # One flush at a time: a second one would rewrite the journal without
+        # the sends the first has taken out of the buffer but not yet committed
+        async with self._flush_lock:
+            await self._flush(db)
+
+    async def _flush(self, db: Optional[AsyncSession]):
+        if not self.pending_count:
+            return
+        delivered, failed = self._delivered, self._failed
+        self._delivered, self._failed = {}, []
+
+        session = db or AsyncSessionLocal()
+        try:
+            connection = await session.connection()
+            if delivered:
+                await connection.execute(
+                    update(Message.__table__)
+                    .where(
+                        Message.__table__.c.id == bindparam("b_id"),
+                        Message.__table__.c.is_delivered == False,  # noqa: E712
+                    )
+                    .values(
+                        is_delivered=True,
+                        delivered_at=bindparam("b_delivered_at"),
+                        claimed_by=None,
+                        claimed_until=None,
+                    ),
+                    [
+                        {"b_id": message_id, "b_delivered_at": delivered_at}
+                        for message_id, delivered_at in delivered.items()
+                    ],
+                )
+            if failed:
+                await connection.execute(
+                    update(Message.__table__)
+                    .where(
+                        Message.__table__.c.id == bindparam("b_id"),
+                        Message.__table__.c.claimed_by == bindparam("b_claimed_by"),
+                    )
+                    .values(
+                        attempt_count=bindparam("b_attempt_count"),
+                        next_attempt_at=bindparam("b_next_attempt_at"),
+                        last_error=bindparam("b_last_error"),
+                        is_dead_lettered=bindparam("b_is_dead_lettered"),
+                        claimed_by=None,
+                        claimed_until=None,
+                    ),
+                    failed,
+                )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            # Keep the outcomes for the next flush; the journal still has the sends
+            delivered.update(self._delivered)
+            self._delivered = delivered
+            self._failed = failed + self._failed
+            logger.error(f"Error flushing delivery outcomes: {str(e)}", exc_info=True)
+            return
+        finally:
+            if db is None:
+                await session.close()
+
+        if self._journal is not None:
+            # Keep the sends recorded while this flush was running
+            self._journal.truncate(0)
+            self._journal.seek(0)
+            self._journal.writelines(f"{message_id}\n" for message_id in self._delivered)
+            self._journal.flush()
+        logger.info(f"Flushed {len(delivered)} deliveries and {len(failed)} failures")
+
+    async def run_periodic_flush(self):
+        """
+        Flush buffered outcomes every DELIVERY_FLUSH_INTERVAL_SECONDS until cancelled
+        """
+        while True:
+            await asyncio.sleep(settings.DELIVERY_FLUSH_INTERVAL_SECONDS)
+            await self.flush()
+
+    async def replay_journals(self, db: AsyncSession):
+        """
+        Mark every message found in another worker's journal as delivered.
+
+        Journals of workers that have been silent for longer than the claim TTL
+        are removed after replaying; by then their claims have expired anyway.
+        """
+        if not self.journal_dir.is_dir():
+            return
+        stale_before = time.time() - settings.DELIVERY_CLAIM_TTL_SECONDS
+        for path in self.journal_dir.glob("*.journal"):
+            if path == self.journal_path:
+                continue
+            try:
+                stale = path.stat().st_mtime < stale_before
+                lines = path.read_text(encoding="utf-8").split("\n")
+            except OSError:
+                continue
+            message_ids = [int(line) for line in lines if line.strip().isdigit()]
+            if message_ids:
+                result = await db.execute(
+                    update(Message)
+                    .where(Message.id.in_(message_ids), Message.is_delivered == False)  # noqa: E712
+                    .values(
+                        is_delivered=True,
+                        delivered_at=ist_now(),
+                        claimed_by=None,
+                        claimed_until=None,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if result.rowcount:
+                    logger.warning(f"Recovered {result.rowcount} unflushed deliveries from {path.name}")
+            if stale:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
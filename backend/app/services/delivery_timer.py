@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import pytz
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import AsyncSessionLocal
+from app.models.message import Message
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Set timezone to IST
+IST = pytz.timezone('Asia/Kolkata')
+
+def ist_now() -> datetime:
+    """Current IST time as a naive datetime, matching how delivery dates are stored"""
+    return datetime.now(IST).replace(tzinfo=None)
+
+# Rows written by other processes are picked up by their updated_at. The poll
+# looks back this far behind the newest value it has seen, for transactions
+# that stamped their rows earlier but committed later.
+CHANGE_OVERLAP = timedelta(seconds=5)
+
+# Messages that still have to be delivered
+PENDING = (
+    Message.is_delivered == False,  # noqa: E712
+    Message.is_dead_lettered == False,  # noqa: E712
+    Message.recipient_email.isnot(None),
+)
+
+class DeliveryTimer:
+    """
+    Event-driven timer that sleeps until the next scheduled delivery.
+
+    Undelivered messages due before the end of the current window are kept in a
+    min-heap keyed on delivery_date, or on next_attempt_at for pending retries. The timer sleeps until the earliest entry
+    and is woken early by the message endpoints when they touch a message inside
+    the window. Entries are invalidated lazily: a heap entry only counts if it
+    still matches the delivery date recorded for that message id. While idle
+    it also checks for overdue messages every poll interval, which retries
+    passes that failed.
+
+    The endpoint wakeups only reach the timer in the same process. With
+    several API processes, or a standalone scheduler, messages written
+    elsewhere are found by polling for rows whose updated_at moved past the
+    newest one seen, every change poll interval. Polling is off while the
+    interval is 0.
+    """
+
+    def __init__(
+        self,
+        window_seconds: Optional[int] = None,
+        poll_seconds: Optional[float] = None,
+        change_poll_seconds: Optional[float] = None,
+    ):
+        self.window = timedelta(seconds=window_seconds or settings.SCHEDULER_WINDOW_SECONDS)
+        self.poll_interval = timedelta(seconds=poll_seconds or settings.SCHEDULER_POLL_SECONDS)
+        self.set_change_poll(settings.SCHEDULER_CHANGE_POLL_SECONDS if change_poll_seconds is None else change_poll_seconds)
+        self._heap: List[Tuple[datetime, int]] = []
+        self._scheduled: Dict[int, datetime] = {}
+        self._window_end: Optional[datetime] = None
+        self._deferred_until: Optional[datetime] = None
+        self._next_poll: Optional[datetime] = None
+        self._next_change_poll: Optional[datetime] = None
+        self._changes_since: Optional[datetime] = None
+        self._seen_changes: Dict[int, datetime] = {}
+        self._wakeup = asyncio.Event()
+
+    def set_change_poll(self, seconds: float):
+        """
+        Poll for messages written by other processes every seconds, or never if 0
+        """
+        self.change_poll_interval = timedelta(seconds=seconds) if seconds else None
+        self._next_change_poll = None
+
+    def _in_window(self, delivery_date: Optional[datetime]) -> bool:
+        return (
+            delivery_date is not None
+            and self._window_end is not None
+            and delivery_date <= self._window_end
+        )
+
+    def _push(self, message_id: int, delivery_date: datetime):
+        self._scheduled[message_id] = delivery_date
+        heapq.heappush(self._heap, (delivery_date, message_id))
+
+    def notify_message_changed(self, message_id: int, delivery_date: Optional[datetime], is_delivered: bool = False):
+        """
+        Record a created or updated message and wake the timer if it falls inside the window
+        """
+        was_scheduled = self._scheduled.pop(message_id, None) is not None
+        in_window = not is_delivered and self._in_window(delivery_date)
+        if in_window:
+            self._push(message_id, delivery_date)
+        if in_window or was_scheduled:
+            self._wakeup.set()
+
+    def notify_message_deleted(self, message_id: int):
+        """
+        Drop a deleted message from the heap and wake the timer if it was scheduled
+        """
+        if self._scheduled.pop(message_id, None) is not None:
+            self._wakeup.set()
+
+    async def _has_overdue(self, db: AsyncSession, now: datetime) -> bool:
+        return (await db.execute(
+            select(Message.id).where(
+                *PENDING,
+                Message.delivery_date <= now,
+                or_(Message.next_attempt_at.is_(None), Message.next_attempt_at <= now),
+            ).limit(1)
+        )).first() is not None
+
+    async def _check_overdue(self, now: datetime) -> bool:
+        async with AsyncSessionLocal() as db:
+            return await self._has_overdue(db, now)
+
+    async def _load_window(self, now: datetime) -> bool:
+        """
+        Rebuild the heap with the messages due inside the window starting at now.
+
+        Overdue rows are not loaded, only detected, so a large backlog does not
+        end up in memory. Returns True if there is anything overdue to deliver.
+        """
+        window_end = now + self.window
+        async with AsyncSessionLocal() as db:
+            has_overdue = await self._has_overdue(db, now)
+            # First deliveries are keyed on delivery_date, pending retries on next_attempt_at
+            rows = (await db.execute(
+                select(Message.id, func.coalesce(Message.next_attempt_at, Message.delivery_date).label("due_at")).where(
+                    *PENDING,
+                    or_(
+                        and_(
+                            Message.next_attempt_at.is_(None),
+                            Message.delivery_date > now,
+                            Message.delivery_date <= window_end,
+                        ),
+                        and_(
+                            Message.next_attempt_at > now,
+                            Message.next_attempt_at <= window_end,
+                        ),
+                    ),
+                )
+            )).all()
+            latest_change = (await db.execute(select(func.max(Message.updated_at)))).scalar()
+
+        self._heap = []
+        self._scheduled = {}
+        for row in rows:
+            self._push(row.id, row.due_at)
+        self._window_end = window_end
+        self._changes_since = latest_change or datetime.utcnow()
+        self._seen_changes = {}
+        logger.info(f"Loaded {len(rows)} messages due before {window_end}")
+        return has_overdue
+
+    async def _poll_changes(self, now: datetime):
+        """
+        Schedule pending messages inside the window that were written since the last poll
+        """
+        async with AsyncSessionLocal() as db:
+            due_at = func.coalesce(Message.next_attempt_at, Message.delivery_date)
+            rows = (await db.execute(
+                select(Message.id, due_at.label("due_at"), Message.updated_at).where(
+                    Message.updated_at > self._changes_since - CHANGE_OVERLAP,
+                    *PENDING,
+                    due_at <= self._window_end,
+                    # Rows claimed by a delivery pass are already being sent
+                    or_(Message.claimed_until.is_(None), Message.claimed_until < now),
+                )
+            )).all()
+            latest_change = (await db.execute(select(func.max(Message.updated_at)))).scalar()
+
+        for row in rows:
+            # Rows in the overlap come back on every poll; only act on each write once
+            if self._seen_changes.get(row.id) != row.updated_at:
+                self._seen_changes[row.id] = row.updated_at
+                if self._scheduled.get(row.id) != row.due_at:
+                    self._push(row.id, row.due_at)
+        if latest_change is not None and latest_change > self._changes_since:
+            self._changes_since = latest_change
+            horizon = self._changes_since - CHANGE_OVERLAP
+            self._seen_changes = {
+                message_id: updated_at for message_id, updated_at in self._seen_changes.items() if updated_at > horizon
+            }
+
+    def _pop_due(self, now: datetime) -> int:
+        """Remove every valid entry that is due and return how many there were"""
+        due_count = 0
+        while self._heap and self._heap[0][0] <= now:
+            delivery_date, message_id = heapq.heappop(self._heap)
+            if self._scheduled.get(message_id) == delivery_date:
+                del self._scheduled[message_id]
+                due_count += 1
+        return due_count
+
+    def _next_deadline(self) -> Optional[datetime]:
+        while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        deadline = self._window_end
+        if self._heap:
+            deadline = min(self._heap[0][0], deadline)
+        if self._deferred_until is not None:
+            deadline = min(self._deferred_until, deadline)
+        return deadline
+
+    async def run(self, deliver: Callable[[], Awaitable[Optional[datetime]]]):
+        """
+        Sleep until the earliest scheduled delivery, then run a delivery pass.
+        A pass may return a time to run again at, for work it had to hold back.
+        """
+        logger.info(f"Delivery timer started with a {self.window} window")
+        # Force a reload, the heap may be stale after a period without leadership
+        self._window_end = None
+        self._deferred_until = None
+        self._next_change_poll = None
+        while True:
+            now = ist_now()
+            has_overdue = False
+            if self._window_end is None or now >= self._window_end:
+                has_overdue = await self._load_window(now)
+                self._next_poll = now + self.poll_interval
+            elif now >= self._next_poll:
+                has_overdue = await self._check_overdue(now)
+                self._next_poll = now + self.poll_interval
+            if self.change_poll_interval and (self._next_change_poll is None or now >= self._next_change_poll):
+                await self._poll_changes(now)
+                self._next_change_poll = now + self.change_poll_interval
+
+            due_count = self._pop_due(now)
+            deferred_due = self._deferred_until is not None and self._deferred_until <= now
+            if has_overdue or due_count or deferred_due:
+                logger.info(f"{due_count} scheduled messages are due, running delivery")
+                self._deferred_until = None
+                try:
+                    self._deferred_until = await deliver()
+                except Exception as e:
+                    logger.error(f"Error in delivery pass: {str(e)}", exc_info=True)
+                continue
+
+            deadline = min(self._next_deadline(), self._next_poll)
+            if self.change_poll_interval:
+                deadline = min(deadline, self._next_change_poll)
+            timeout = max((deadline - now).total_seconds(), 0)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+delivery_timer = DeliveryTimer()
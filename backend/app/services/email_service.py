@@ -2,8 +2,8 @@ from fastapi import HTTPException
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from jinja2 import Environment, FileSystemLoader
-import os
+from app.core.email import send_email as send_pooled_email, EmailSchema
+from app.core.templates import email_templates, RenderedEmail
 
 class EmailService:
     def __init__(self):
@@ -11,16 +11,15 @@ class EmailService:
         self.smtp_port = 587
         self.sender_email = "your-email@gmail.com"  # Replace with your email
         self.sender_password = "your-app-password"  # Replace with your app password
-        
-        # Set up Jinja2 environment
-        template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+
+    def render(self, title: str, content: str) -> RenderedEmail:
+        """Render the plain-text and HTML parts from the precompiled message template"""
+        return email_templates.render('email_template', title=title, content=content)
 
     def send_email(self, recipient_email: str, subject: str, title: str, content: str):
         try:
-            # Load and render the template
-            template = self.env.get_template('email_template.html')
-            html_content = template.render(title=title, content=content)
+            # Render the template
+            rendered = self.render(title=title, content=content)
 
             # Create message
             msg = MIMEMultipart('alternative')
@@ -28,8 +27,9 @@ class EmailService:
             msg['From'] = self.sender_email
             msg['To'] = recipient_email
 
-            # Attach HTML content
-            msg.attach(MIMEText(html_content, 'html'))
+            # Attach the plain-text and HTML parts
+            msg.attach(MIMEText(rendered.text, 'plain'))
+            msg.attach(MIMEText(rendered.html, 'html'))
 
             # Send email
             with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
@@ -41,10 +41,37 @@ class EmailService:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
 
+    async def send_email_async(self, recipient_email: str, subject: str, title: str, content: str):
+        """
+        Non-blocking variant of send_email for use inside the event loop.
+
+        Sends through the shared SMTP connection pool used by app.core.email, so
+        it reuses the same authenticated sessions and is bounded by the same
+        connection limit instead of opening its own connection per call.
+        """
+        rendered = self.render(title=title, content=content)
+        email = EmailSchema(
+            email=[recipient_email],
+            subject=subject,
+            body=rendered.text,
+            html=rendered.html
+        )
+        if not await send_pooled_email(email):
+            raise HTTPException(status_code=500, detail="Failed to send email")
+        return True
+
     def send_test_email(self, recipient_email: str):
         return self.send_email(
             recipient_email=recipient_email,
             subject="Test Email from After Life Message Service",
             title="Test Message",
             content="This is a test email from the After Life Message Service. If you're receiving this, the email service is working correctly!"
-        ) 
\ No newline at end of file
+        )
+
+    async def send_test_email_async(self, recipient_email: str):
+        return await self.send_email_async(
+            recipient_email=recipient_email,
+            subject="Test Email from After Life Message Service",
+            title="Test Message",
+            content="This is a test email from the After Life Message Service. If you're receiving this, the email service is working correctly!"
+        )
\ No newline at end of file
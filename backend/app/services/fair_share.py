@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import case, func, literal, or_, select
+from app.models.message import Message
+from app.services.delivery_timer import ist_now
+from app.core.config import settings
+
+# Quota intervals are aligned to this instant, so every process agrees on them
+INTERVAL_EPOCH = datetime(2000, 1, 1)
+
+class FairShare:
+    """
+    Fair-share ordering and per-sender quotas for claiming due messages.
+
+    Due messages are ranked within each sender by delivery date, and a claim
+    takes rank 1 of every sender before rank 2 of any, so senders are served
+    round-robin. A sender's weight from SENDER_WEIGHTS stretches its share of
+    every round and its quota. Each sender may have at most
+    SENDER_QUOTA_PER_INTERVAL (times its weight) messages claimed per
+    SENDER_QUOTA_INTERVAL_SECONDS; the rest wait for the next interval, which
+    spreads a peak over the capacity there is instead of letting one sender
+    fill it. Messages later than MAX_LATENESS_SECONDS ignore the quota and are
+    claimed first, still round-robin, so waiting for a quota is bounded.
+
+    Each claim ranks only a pool of the earliest due messages, see pool.
+
+    Quotas are counted in the database from the claimed_at stamp every claim
+    writes, so they hold across all delivery workers and processes.
+    """
+
+    def __init__(self, weights: Optional[Dict[int, float]] = None):
+        self.weights = weights if weights is not None else settings.SENDER_WEIGHTS
+        self.interval = settings.SENDER_QUOTA_INTERVAL_SECONDS
+
+    def interval_start(self, current_time: datetime) -> datetime:
+        """Start of the quota interval current_time falls in"""
+        elapsed = (current_time - INTERVAL_EPOCH).total_seconds()
+        return current_time - timedelta(seconds=elapsed % self.interval)
+
+    def _weight(self, user_id_column):
+        if not self.weights:
+            return literal(1.0)
+        return case(
+            *((user_id_column == user_id, float(weight)) for user_id, weight in self.weights.items()),
+            else_=1.0,
+        )
+
+    def _claimed(self, current_time: datetime):
+        # Messages claimed per sender so far in the current interval. Grouping
+        # by user_id + 0 keeps SQLite from walking a user_id index over the whole
+        # table to avoid a sort, it reads the claimed_at range instead.
+        user_id = (Message.user_id + 0).label("user_id")
+        return (
+            select(user_id, func.count().label("claimed"))
+            .where(Message.claimed_at >= self.interval_start(current_time))
+            .group_by(user_id)
+            .subquery()
+        )
+
+    def _too_late(self, delivery_date_column, current_time: datetime):
+        return delivery_date_column <= current_time - timedelta(seconds=settings.MAX_LATENESS_SECONDS)
+
+    def pool(self, claimable, current_time: datetime):
+        """
+        Select the ids of the first FAIR_SHARE_POOL_SIZE claimable messages by
+        delivery date, leaving out on-time messages of senders whose quota is
+        used up. Only the pool is ranked, so a claim costs the same however
+        many messages are due.
+        """
+        pool = select(Message.id).where(*claimable)
+        if settings.SENDER_QUOTA_PER_INTERVAL:
+            claimed = self._claimed(current_time)
+            exhausted = select(claimed.c.user_id).where(
+                claimed.c.user_id.isnot(None),
+                claimed.c.claimed >= settings.SENDER_QUOTA_PER_INTERVAL * self._weight(claimed.c.user_id),
+            )
+            pool = pool.where(or_(self._too_late(Message.delivery_date, current_time), Message.user_id.not_in(exhausted)))
+        return pool.order_by(Message.delivery_date, Message.id).limit(settings.FAIR_SHARE_POOL_SIZE)
+
+    def candidates(self, pool_ids, current_time: datetime, batch_size: int):
+        """
+        Select the ids of up to batch_size messages out of pool_ids (made by
+        pool) in fair-share order
+        """
+        ranked = (
+            select(
+                Message.id,
+                Message.user_id,
+                Message.delivery_date,
+                func.row_number().over(
+                    partition_by=Message.user_id,
+                    order_by=(Message.delivery_date, Message.id),
+                ).label("rank"),
+            )
+            .where(Message.id.in_(pool_ids))
+            .subquery()
+        )
+        too_late = self._too_late(ranked.c.delivery_date, current_time)
+        selected = select(ranked.c.id)
+        if settings.SENDER_QUOTA_PER_INTERVAL:
+            claimed = self._claimed(current_time)
+            quota = settings.SENDER_QUOTA_PER_INTERVAL * self._weight(ranked.c.user_id)
+            selected = (
+                selected
+                .outerjoin(claimed, claimed.c.user_id == ranked.c.user_id)
+                .where(or_(too_late, ranked.c.rank + func.coalesce(claimed.c.claimed, 0) <= quota))
+            )
+        return (
+            selected
+            .order_by(
+                case((too_late, 0), else_=1),
+                ranked.c.rank / self._weight(ranked.c.user_id),
+                ranked.c.delivery_date,
+                ranked.c.id,
+            )
+            .limit(batch_size)
+        )
+
+    def next_interval(self) -> datetime:
+        """IST time at which the quotas reset"""
+        return self.interval_start(ist_now()) + timedelta(seconds=self.interval)
+
+fair_share = FairShare()
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional
+from pydantic import BaseModel
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models.message import Message
+from app.core.config import settings
+from app.core.email import build_notification_email, build_scheduled_summary_email, send_email, EmailSchema
+from app.core.send_guard import SendPausedError
+from app.services.job_queue import job_handler
+from app.services.message_email import prerender_message
+
+logger = logging.getLogger(__name__)
+
+class SendEmailJob(BaseModel):
+    email_to: str
+    subject: str
+    body: str
+    html: Optional[str] = None
+
+class ScheduledNotificationJob(BaseModel):
+    user_id: int
+    recipient_email: str
+    message_ids: List[int]
+
+class GenerateContentJob(BaseModel):
+    message_id: int
+
+class UploadMediaJob(BaseModel):
+    message_id: int
+    path: str
+    filename: str
+    content_type: Optional[str] = None
+
+async def _send_or_retry(email_schema: EmailSchema):
+    # An email send_guard held back fails the job like any other failed send, so it is retried
+    try:
+        sent = await send_email(email_schema)
+    except SendPausedError as e:
+        raise RuntimeError(f"Email '{email_schema.subject}' to {email_schema.email[0]} was held back: {str(e)}")
+    if not sent:
+        raise RuntimeError(f"Email '{email_schema.subject}' to {email_schema.email[0]} could not be sent")
+
+@job_handler("email.send", SendEmailJob, lane="critical")
+async def send_email_job(job: SendEmailJob):
+    await _send_or_retry(EmailSchema(email=[job.email_to], subject=job.subject, body=job.body, html=job.html))
+
+def _scheduled_messages(job: ScheduledNotificationJob) -> List[tuple]:
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Message.id, Message.title, Message.delivery_date).where(
+                Message.id.in_(job.message_ids),
+                Message.user_id == job.user_id,
+                Message.recipient_email == job.recipient_email,
+                Message.is_delivered == False,  # noqa: E712
+            )
+        ).all()
+    finally:
+        db.close()
+    by_id = {row.id: (row.title, row.delivery_date.strftime('%Y-%m-%d %H:%M:%S')) for row in rows}
+    return [by_id[message_id] for message_id in job.message_ids if message_id in by_id]
+
+@job_handler("notification.scheduled", ScheduledNotificationJob, lane="critical")
+async def scheduled_notification_job(job: ScheduledNotificationJob):
+    """
+    Send the "has been scheduled" notification collected by the notification
+    debouncer. Messages are read as they are now, so deleted, delivered or
+    readdressed ones are left out; one message gets the usual notification,
+    several get a summary.
+    """
+    messages = await asyncio.to_thread(_scheduled_messages, job)
+    if not messages:
+        logger.info(f"No scheduled messages left to notify {job.recipient_email} about")
+        return
+    if len(messages) == 1:
+        message_title, delivery_date = messages[0]
+        email_schema = build_notification_email("scheduled_notification", job.recipient_email, message_title, delivery_date)
+    else:
+        email_schema = build_scheduled_summary_email(job.recipient_email, messages)
+    await _send_or_retry(email_schema)
+
+@job_handler("ai.generate", GenerateContentJob)
+async def generate_content_job(job: GenerateContentJob):
+    """
+    Generate message text with OpenAI from the message's generation_settings
+    and personality_profile, storing it as generation_settings["generated_content"]
+    and rendering the message email again with it
+    """
+    try:
+        from openai import AsyncOpenAI
+    except ImportError:
+        raise RuntimeError("The openai package is required for AI generation")
+    if not settings.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not configured")
+
+    db = SessionLocal()
+    try:
+        message = db.get(Message, job.message_id)
+        if message is None:
+            logger.info(f"Message {job.message_id} no longer exists, skipping generation")
+            return
+        generation_settings = dict(message.generation_settings or {})
+        system_prompt = "You write personal messages to be delivered to loved ones."
+        if message.personality_profile:
+            system_prompt += f" Match this personality profile: {message.personality_profile}"
+        prompt = generation_settings.get("prompt") or message.content
+        model = generation_settings.get("model", "gpt-4")
+    finally:
+        db.close()
+
+    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ],
+    )
+
+    db = SessionLocal()
+    try:
+        message = db.get(Message, job.message_id)
+        if message is None:
+            return
+        generation_settings = dict(message.generation_settings or {})
+        generation_settings["generated_content"] = response.choices[0].message.content
+        message.generation_settings = generation_settings
+        prerender_message(message, message.user.full_name)
+        db.commit()
+    finally:
+        db.close()
+
+@job_handler("media.upload", UploadMediaJob, lane="bulk")
+async def upload_media_job(job: UploadMediaJob):
+    """
+    Upload a staged file to S3 and append its URL to the message's media_urls.
+
+    The file was staged in JOB_STAGING_DIR by the API process that took the
+    upload, so a worker on another host only finds it if that directory is on
+    storage both hosts mount.
+    """
+    try:
+        import boto3
+    except ImportError:
+        raise RuntimeError("The boto3 package is required for media uploads")
+    if not os.path.exists(job.path):
+        raise RuntimeError(f"Staged file {job.path} is not on this host, JOB_STAGING_DIR must be shared storage")
+
+    key = f"messages/{job.message_id}/{job.filename}"
+    s3 = boto3.client(
+        "s3",
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION,
+    )
+    extra_args = {"ContentType": job.content_type} if job.content_type else None
+    await asyncio.to_thread(s3.upload_file, job.path, settings.S3_BUCKET, key, ExtraArgs=extra_args)
+    url = f"https://{settings.S3_BUCKET}.s3.{settings.AWS_REGION}.amazonaws.com/{key}"
+
+    db = SessionLocal()
+    try:
+        message = db.get(Message, job.message_id)
+        if message is not None:
+            message.media_urls = list(message.media_urls or []) + [url]
+            db.commit()
+    finally:
+        db.close()
+    os.remove(job.path)
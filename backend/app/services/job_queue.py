@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Type, Union
+from pydantic import BaseModel
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+from app.db import base  # noqa: F401  (registers every model when run standalone)
+from app.db.session import SKIP_LOCKED_DIALECTS, SessionLocal
+from app.models.job import Job
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class JobHandler(NamedTuple):
+    payload_model: Type[BaseModel]
+    func: Callable[[BaseModel], Awaitable[None]]
+    lane: str
+
+_handlers: Dict[str, JobHandler] = {}
+
+def job_handler(kind: str, payload_model: Type[BaseModel], lane: str = "default"):
+    """
+    Register the decorated coroutine as the handler for jobs of the given kind.
+    Payloads are validated against payload_model when queued and again when run.
+    """
+    if lane not in settings.JOB_LANES:
+        raise ValueError(f"Unknown job lane '{lane}'")
+
+    def decorator(func: Callable[[BaseModel], Awaitable[None]]):
+        _handlers[kind] = JobHandler(payload_model, func, lane)
+        return func
+    return decorator
+
+def enqueue_jobs(
+    db: Session,
+    kind: str,
+    payloads: List[Union[BaseModel, dict]],
+    lane: Optional[str] = None,
+    run_after: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+    dedupe_key: Optional[str] = None,
+) -> List[Job]:
+    """
+    Store one job per payload for the workers in a single transaction and
+    return them. lane defaults to the handler's lane. Only one queued job may
+    hold a given dedupe_key, storing a second raises IntegrityError; a claimed
+    job gives its key up.
+    """
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    lane = lane or handler.lane
+    if lane not in settings.JOB_LANES:
+        raise ValueError(f"Unknown job lane '{lane}'")
+
+    jobs = [
+        Job(
+            kind=kind,
+            lane=lane,
+            priority=settings.JOB_LANES[lane],
+            payload=(handler.payload_model(**payload) if isinstance(payload, dict) else payload).model_dump(mode="json"),
+            run_after=run_after or datetime.utcnow(),
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            dedupe_key=dedupe_key,
+        )
+        for payload in payloads
+    ]
+    db.add_all(jobs)
+    db.commit()
+    return jobs
+
+def enqueue_job(
+    db: Session,
+    kind: str,
+    payload: Union[BaseModel, dict],
+    lane: Optional[str] = None,
+    run_after: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+    dedupe_key: Optional[str] = None,
+) -> Job:
+    """
+    Store a job for the workers and return it. lane defaults to the handler's lane.
+    """
+    job, = enqueue_jobs(db, kind, [payload], lane, run_after, max_attempts, dedupe_key)
+    db.refresh(job)
+    return job
+
+def claim_jobs(db: Session, worker_id: str, limit: int, lanes: Optional[Iterable[str]] = None):
+    """
+    Atomically claim up to limit runnable jobs, highest priority lane first.
+
+    A job is runnable when it is queued and its run_after has passed, or when
+    it is running but its lock expired because the worker holding it died. The
+    claim works like the scheduler's message claim: a token unique to this call
+    is written into locked_by, with SKIP LOCKED where the dialect supports it
+    and a compare-and-set UPDATE on SQLite.
+    """
+    now = datetime.utcnow()
+    claim_token = f"{worker_id}/{uuid.uuid4().hex[:12]}"
+    claimable = (
+        or_(
+            and_(Job.status == "queued", Job.run_after <= now),
+            and_(Job.status == "running", Job.locked_until < now),
+        ),
+    )
+    if lanes is not None:
+        claimable += (Job.lane.in_(list(lanes)),)
+    candidates = (
+        select(Job.id)
+        .where(*claimable)
+        .order_by(Job.priority, Job.run_after, Job.id)
+        .limit(limit)
+    )
+
+    if db.get_bind().dialect.name in SKIP_LOCKED_DIALECTS:
+        candidate_ids = db.execute(candidates.with_for_update(skip_locked=True)).scalars().all()
+        target = Job.id.in_(candidate_ids)
+    else:
+        target = Job.id.in_(candidates.scalar_subquery())
+
+    db.execute(
+        update(Job)
+        .where(target, *claimable)
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            locked_by=claim_token,
+            locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT_SECONDS),
+            # Work arriving for this key from now on goes into a new job
+            dedupe_key=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    return db.execute(
+        select(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts, Job.locked_by)
+        .where(Job.locked_by == claim_token)
+        .order_by(Job.priority, Job.run_after, Job.id)
+    ).all()
+
+def _finish(db: Session, job, **values):
+    # Guarded by the claim token so a job taken over after its lock expired is left alone
+    db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.locked_by == job.locked_by)
+        .values(locked_by=None, locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def complete_job(db: Session, job):
+    _finish(db, job, status="done", finished_at=datetime.utcnow(), last_error=None)
+
+def fail_job(db: Session, job, error: str):
+    """
+    Requeue a failed job with exponential backoff, or mark it dead once it has
+    used up its attempts
+    """
+    if job.attempts >= job.max_attempts:
+        logger.error(f"Job {job.id} ({job.kind}) is dead after {job.attempts} attempts: {error}")
+        _finish(db, job, status="dead", finished_at=datetime.utcnow(), last_error=error)
+        return
+    delay = settings.JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+    _finish(db, job, status="queued", run_after=datetime.utcnow() + timedelta(seconds=delay), last_error=error)
+
+def release_job(db: Session, job):
+    """Hand an interrupted job back without counting the attempt"""
+    _finish(db, job, status="queued", attempts=Job.attempts - 1)
+
+class JobWorker:
+    """
+    Runs jobs from the selected lanes, at most concurrency at a time.
+
+    Each job gets JOB_VISIBILITY_TIMEOUT_SECONDS to finish; after that it is
+    cancelled and failed, because another worker is free to claim it by then.
+    """
+
+    def __init__(self, lanes: Optional[Iterable[str]] = None, concurrency: Optional[int] = None):
+        self.lanes = list(lanes) if lanes else None
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Set[asyncio.Task] = set()
+
+    async def _run_job(self, job):
+        # Job bookkeeping is synchronous, so it runs in a thread to keep the
+        # event loop free when the worker shares it with the API
+        db = SessionLocal()
+        try:
+            handler = _handlers.get(job.kind)
+            if handler is None:
+                await asyncio.to_thread(fail_job, db, job, f"No handler registered for job kind '{job.kind}'")
+                return
+            try:
+                payload = handler.payload_model(**job.payload)
+                await asyncio.wait_for(handler.func(payload), timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS)
+            except asyncio.CancelledError:
+                await asyncio.to_thread(release_job, db, job)
+                raise
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(fail_job, db, job, "Timed out")
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}", exc_info=True)
+                await asyncio.to_thread(fail_job, db, job, str(e))
+            else:
+                await asyncio.to_thread(complete_job, db, job)
+                logger.info(f"Job {job.id} ({job.kind}) done")
+        finally:
+            db.close()
+
+    def _claim(self, limit: int):
+        db = SessionLocal()
+        try:
+            return claim_jobs(db, self.worker_id, limit, self.lanes)
+        finally:
+            db.close()
+
+    async def run(self):
+        """Claim and run jobs until cancelled"""
+        lanes = ", ".join(self.lanes) if self.lanes else "all lanes"
+        logger.info(f"Job worker {self.worker_id} started on {lanes} with concurrency {self.concurrency}")
+        try:
+            while True:
+                free = self.concurrency - len(self._running)
+                jobs = []
+                if free > 0:
+                    try:
+                        jobs = await asyncio.to_thread(self._claim, free)
+                    except Exception as e:
+                        logger.error(f"Error claiming jobs: {str(e)}", exc_info=True)
+
+                for job in jobs:
+                    task = asyncio.create_task(self._run_job(job))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+
+                if not jobs or len(self._running) >= self.concurrency:
+                    if self._running:
+                        await asyncio.wait(
+                            self._running,
+                            timeout=settings.JOB_POLL_INTERVAL_SECONDS,
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                    else:
+                        await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+        finally:
+            for task in self._running:
+                task.cancel()
+            await asyncio.gather(*self._running, return_exceptions=True)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.db.session import AsyncSessionLocal
+from app.models.scheduler_lease import SchedulerLease
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LeaderLease:
+    """
+    Lease-based leader election backed by a row in the scheduler_lease table.
+
+    The holder renews the lease every third of its TTL. Any other instance may
+    take it over once it has expired, so a crashed leader is replaced within one
+    TTL without any manual intervention.
+    """
+
+    def __init__(self, name: str = "scheduler", ttl_seconds: Optional[int] = None):
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds or settings.SCHEDULER_LEASE_TTL_SECONDS)
+        self.renew_interval = self.ttl.total_seconds() / 3
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def try_acquire(self) -> bool:
+        """
+        Acquire or renew the lease. Returns True if this instance holds it afterwards.
+        """
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.execute(
+                    update(SchedulerLease)
+                    .where(
+                        SchedulerLease.name == self.name,
+                        or_(
+                            SchedulerLease.holder == self.holder_id,
+                            SchedulerLease.holder.is_(None),
+                            SchedulerLease.expires_at < now,
+                        ),
+                    )
+                    .values(holder=self.holder_id, heartbeat_at=now, expires_at=now + self.ttl)
+                )
+                if result.rowcount:
+                    await db.commit()
+                    return True
+
+                await db.rollback()
+                if (await db.execute(select(SchedulerLease.id).where(SchedulerLease.name == self.name))).first():
+                    return False
+
+                # First run against this database: create the lease row
+                db.add(SchedulerLease(
+                    name=self.name,
+                    holder=self.holder_id,
+                    heartbeat_at=now,
+                    expires_at=now + self.ttl,
+                ))
+                await db.commit()
+                return True
+            except IntegrityError:
+                # Another instance created the row first
+                await db.rollback()
+                return False
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Error acquiring lease '{self.name}': {str(e)}", exc_info=True)
+                return False
+
+    async def release(self):
+        """
+        Give up the lease so another instance can take over immediately
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder_id)
+                    .values(holder=None, expires_at=None)
+                )
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Error releasing lease '{self.name}': {str(e)}", exc_info=True)
+
+    async def run_as_leader(self, job: Callable[[], Awaitable[None]], wait: bool = True) -> bool:
+        """
+        Run job while holding the lease, cancelling it if the lease is lost.
+
+        With wait=True this keeps competing for the lease and restarts the job
+        whenever leadership is regained. With wait=False it makes a single attempt.
+        Returns True if the job ran to completion.
+        """
+        while True:
+            if not await self.try_acquire():
+                if not wait:
+                    logger.info(f"Lease '{self.name}' is held by another instance")
+                    return False
+                await asyncio.sleep(self.renew_interval)
+                continue
+
+            logger.info(f"Acquired lease '{self.name}' as {self.holder_id}")
+            task = asyncio.create_task(job())
+            try:
+                while True:
+                    done, _ = await asyncio.wait({task}, timeout=self.renew_interval)
+                    if task in done:
+                        task.result()
+                        return True
+                    if not await self.try_acquire():
+                        logger.warning(f"Lost lease '{self.name}', stopping until it can be reacquired")
+                        break
+            finally:
+                if not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                await self.release()
+
+            if not wait:
+                return False
+
+scheduler_lease = LeaderLease()
@@ -0,0 +1,73 @@
+from datetime import datetime
+from typing import Optional
+from app.core.email import EmailSchema, render_email_payload
+from app.core.templates import email_templates
+from app.models.message import Message
+
+# Message fields that end up in the delivered email
+RENDERED_FIELDS = {"title", "content", "delivery_date", "recipient_email", "generation_settings"}
+
+def build_message_email(
+    title: str,
+    content: str,
+    recipient_email: str,
+    delivery_date: Optional[datetime],
+    sender_name: Optional[str] = None,
+    generation_settings: Optional[dict] = None,
+) -> EmailSchema:
+    """
+    Build the email that delivers a message. Content generated by an AI job
+    replaces the written content.
+    """
+    generated_content = (generation_settings or {}).get("generated_content")
+    rendered = email_templates.render(
+        "email_template",
+        title=title,
+        content=generated_content or content,
+        delivery_date=delivery_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_date else None,
+        sender_name=sender_name,
+    )
+    return EmailSchema(
+        email=[recipient_email],
+        subject=f"Your AfterLife Message: {title}",
+        body=rendered.text,
+        html=rendered.html
+    )
+
+def build_digest_email(messages) -> EmailSchema:
+    """
+    Build one email carrying several messages to the same recipient, oldest first
+    """
+    rendered = email_templates.render(
+        "message_digest",
+        messages=[
+            {
+                "title": msg.title,
+                "content": (msg.generation_settings or {}).get("generated_content") or msg.content,
+                "delivery_date": msg.delivery_date.strftime('%Y-%m-%d %H:%M:%S') if msg.delivery_date else None,
+            }
+            for msg in messages
+        ],
+    )
+    return EmailSchema(
+        email=[messages[0].recipient_email],
+        subject=f"You have {len(messages)} AfterLife Messages",
+        body=rendered.text,
+        html=rendered.html
+    )
+
+def prerender_message(message: Message, sender_name: Optional[str] = None):
+    """
+    Store the final MIME payload on the message so delivery only has to send it
+    """
+    if not message.recipient_email:
+        message.rendered_email = None
+        return
+    message.rendered_email = render_email_payload(build_message_email(
+        title=message.title,
+        content=message.content,
+        recipient_email=message.recipient_email,
+        delivery_date=message.delivery_date,
+        sender_name=sender_name,
+        generation_settings=message.generation_settings,
+    ))
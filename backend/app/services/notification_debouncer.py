@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.job import Job
+from app.services.job_queue import enqueue_job
+from app.services.job_handlers import ScheduledNotificationJob
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_KIND = "notification.scheduled"
+
+# Writes that lost a race with another process are retried this many times
+MAX_MERGE_ATTEMPTS = 5
+
+class NotificationDebouncer:
+    """
+    Collapses bursts of "has been scheduled" notifications.
+
+    Changes are collected per sending user and recipient address in a single
+    queued notification.scheduled job, found by its dedupe key. Every change
+    moves the job's run_after to quiet_seconds from now, but never later than
+    max_delay_seconds after the job was queued, so a user who keeps editing
+    still gets one. The job reads the messages when it runs, see
+    scheduled_notification_job.
+
+    Pending notifications live in the job table, so they survive restarts and
+    are shared by every API process.
+    """
+
+    def __init__(self, quiet_seconds: Optional[float] = None, max_delay_seconds: Optional[float] = None):
+        self.quiet = timedelta(seconds=settings.NOTIFICATION_QUIET_SECONDS if quiet_seconds is None else quiet_seconds)
+        self.max_delay = timedelta(
+            seconds=settings.NOTIFICATION_MAX_DELAY_SECONDS if max_delay_seconds is None else max_delay_seconds
+        )
+
+    async def messages_changed(self, user_id: int, changes: Iterable[Tuple[int, str]]):
+        """
+        Record scheduled or rescheduled messages, given as (message id,
+        recipient email) pairs, and restart their quiet period
+        """
+        by_recipient: Dict[str, List[int]] = defaultdict(list)
+        for message_id, recipient_email in changes:
+            by_recipient[recipient_email].append(message_id)
+        if by_recipient:
+            await asyncio.to_thread(self._record, user_id, by_recipient)
+
+    def _record(self, user_id: int, by_recipient: Dict[str, List[int]]):
+        db = SessionLocal()
+        try:
+            for recipient_email, message_ids in by_recipient.items():
+                self._merge(db, user_id, recipient_email, message_ids)
+        finally:
+            db.close()
+
+    def _merge(self, db: Session, user_id: int, recipient_email: str, message_ids: List[int]):
+        dedupe_key = f"{NOTIFICATION_KIND}:{user_id}:{recipient_email}"
+        for _ in range(MAX_MERGE_ATTEMPTS):
+            now = datetime.utcnow()
+            pending = db.execute(
+                select(Job.id, Job.payload, Job.created_at, Job.updated_at)
+                .where(Job.dedupe_key == dedupe_key)
+            ).first()
+            if pending is None:
+                try:
+                    enqueue_job(
+                        db,
+                        NOTIFICATION_KIND,
+                        ScheduledNotificationJob(user_id=user_id, recipient_email=recipient_email, message_ids=message_ids),
+                        run_after=now + min(self.quiet, self.max_delay),
+                        dedupe_key=dedupe_key,
+                    )
+                    return
+                except IntegrityError:
+                    # Another process queued it first; merge into theirs
+                    db.rollback()
+                    continue
+
+            merged = pending.payload["message_ids"]
+            merged += [message_id for message_id in message_ids if message_id not in merged]
+            # updated_at acts as a version: the write is lost if the job was
+            # changed or claimed since it was read, and the merge starts over
+            result = db.execute(
+                update(Job)
+                .where(Job.id == pending.id, Job.dedupe_key == dedupe_key, Job.updated_at == pending.updated_at)
+                .values(
+                    payload=dict(pending.payload, message_ids=merged),
+                    run_after=min(now + self.quiet, pending.created_at + self.max_delay),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if result.rowcount:
+                return
+        logger.error(f"Could not queue the scheduled notification to {recipient_email} for messages {message_ids}")
+
+notification_debouncer = NotificationDebouncer()
@@ -1,13 +1,32 @@
 import asyncio
 import logging
-from datetime import datetime
+import os
+import random
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from collections import defaultdict
+from itertools import zip_longest
+from typing import Dict, List, Optional, Tuple
 import pytz
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.db.session import SessionLocal
-from app.core.email import send_email, EmailSchema
-from app.core.tasks import send_message_delivery_notification_background
-from fastapi import BackgroundTasks
+from sqlalchemy import and_, func, or_, select, update
+from app.db import base  # noqa: F401  (registers every model when run standalone)
+from app.db.session import SKIP_LOCKED_DIALECTS, AsyncSessionLocal, async_engine
+from app.models.message import Message
+from app.models.user import User
+from app.services.delivery_timer import delivery_timer, ist_now
+from app.services.leader import scheduler_lease
+from app.services.delivery_ledger import DeliveryLedger
+from app.services.fair_share import fair_share
+from app.core.email import send_email, send_prerendered_email
+from app.core.send_guard import SendPausedError, send_guard
+from app.services.message_email import build_digest_email, build_message_email
+from app.core.smtp_pool import smtp_pool, PooledConnection
+from app.core.throttle import domain_throttle, recipient_domain
+from app.core.tasks import send_message_delivery_notifications_background
 from app.core.config import settings
 
 # Set up logging with more detailed format
@@ -20,6 +39,13 @@ logger = logging.getLogger(__name__)
 # Set timezone to IST
 IST = pytz.timezone('Asia/Kolkata')
 
+# Identifies this process in message claims and names its delivery journal.
+# Unique per start: in a restarted container hostname and PID repeat, and the
+# journal of the crashed run must be replayed rather than taken over.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+delivery_ledger = DeliveryLedger(WORKER_ID)
+
 def parse_date(date_str):
     """Parse a date string into a datetime object"""
     try:
@@ -31,58 +57,435 @@ def parse_date(date_str):
             logger.error(f"Could not parse date string: {date_str}")
             return None
 
-async def check_and_deliver_messages():
+def due_conditions(current_time: datetime):
+    """
+    Filter for messages that are due and eligible for a delivery attempt
+    """
+    return (
+        Message.is_delivered == False,  # noqa: E712
+        Message.is_dead_lettered == False,  # noqa: E712
+        Message.delivery_date <= current_time,
+        Message.recipient_email.isnot(None),
+        or_(Message.next_attempt_at.is_(None), Message.next_attempt_at <= current_time),
+    )
+
+async def claim_due_batch(
+    db: AsyncSession,
+    current_time: datetime,
+    batch_size: Optional[int] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+):
+    """
+    Atomically claim a batch of due, undelivered messages for this worker.
+
+    Rows that are unclaimed or whose claim has expired are stamped with a claim
+    token unique to this batch and a claim expiry, so several workers can split the due set
+    without delivering the same message twice. On dialects that support it the
+    candidates are locked with SKIP LOCKED; on SQLite the UPDATE re-checks the
+    claim conditions itself and acts as a compare-and-set. due_after and
+    due_before restrict the claim to a slice of delivery dates. Candidates are
+    picked in fair-share order across senders, within their quotas.
+    """
+    # Claimed messages would only wait for the breaker and be released again
+    if send_guard.breaker.open_remaining:
+        return []
+    
+    # Sends another worker made but never flushed must not be claimed again
+    await delivery_ledger.replay_journals(db)
+    
+    batch_size = min(batch_size or settings.SCHEDULER_BATCH_SIZE, max_claim_size())
+    claimable = due_conditions(current_time) + (
+        or_(Message.claimed_until.is_(None), Message.claimed_until < current_time),
+    )
+    if due_after is not None:
+        claimable += (Message.delivery_date > due_after,)
+    if due_before is not None:
+        claimable += (Message.delivery_date <= due_before,)
+    return await _claim(db, claimable, current_time, batch_size)
+
+def max_claim_size() -> int:
+    """
+    Largest batch that can be sent within half the claim TTL even if every
+    message goes to the slowest throttled domain, leaving the other half for
+    SMTP waits
+    """
+    slowest = min(
+        [settings.DOMAIN_RATE_PER_SECOND]
+        + [limit["rate"] for limit in settings.DOMAIN_LIMITS.values() if "rate" in limit]
+    )
+    return max(int(slowest * settings.DELIVERY_CLAIM_TTL_SECONDS / 2), 1)
+
+async def _claim(db: AsyncSession, claimable, current_time: datetime, batch_size: int):
+    """
+    Stamp up to batch_size rows matching claimable, picked in fair-share
+    order, with a new claim token and return them
+    """
+    claim_token = f"{WORKER_ID}/{uuid.uuid4().hex[:12]}"
+    claimed_until = current_time + timedelta(seconds=settings.DELIVERY_CLAIM_TTL_SECONDS)
+    pool = fair_share.pool(claimable, current_time)
+    skip_locked = db.bind.dialect.name in SKIP_LOCKED_DIALECTS
+    if skip_locked:
+        # Lock the pool before ranking it, so concurrent workers rank disjoint
+        # pools instead of all picking the same rows and skipping them. Locked
+        # separately, FOR UPDATE is not allowed together with window functions.
+        pool = (await db.execute(pool.with_for_update(skip_locked=True, of=Message))).scalars().all()
+    else:
+        pool = pool.scalar_subquery()
+    # Fetched first so the UPDATE and the read below look rows up by id
+    candidate_ids = (await db.execute(fair_share.candidates(pool, current_time, batch_size))).scalars().all()
+    if not skip_locked:
+        # End the read before writing, SQLite cannot always upgrade a read
+        # transaction to a write one while other workers write
+        await db.commit()
+    if not candidate_ids:
+        await db.commit()
+        return []
+
+    await db.execute(
+        update(Message)
+        .where(Message.id.in_(candidate_ids), *claimable)
+        .values(claimed_by=claim_token, claimed_until=claimed_until, claimed_at=current_time)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    batch = (await db.execute(
+        select(
+            Message.id,
+            Message.title,
+            Message.content,
+            Message.recipient_email,
+            Message.delivery_date,
+            Message.claimed_by,
+            Message.attempt_count,
+            Message.rendered_email,
+            Message.user_id,
+            Message.generation_settings,
+            # Rendering a message that has no rendered_email needs the sender's name
+            User.full_name.label("sender_name"),
+        )
+        .outerjoin(User, User.id == Message.user_id)
+        .where(Message.id.in_(candidate_ids), Message.claimed_by == claim_token)
+        .order_by(Message.delivery_date, Message.id)
+    )).all()
+    # End the read so the connection goes back to the pool while the batch is delivered
+    await db.commit()
+    return batch
+
+def _digest_key(msg):
+    if settings.DIGEST_MODE == "sender":
+        return (msg.user_id, msg.recipient_email.lower())
+    return msg.recipient_email.lower()
+
+async def claim_digest_companions(db: AsyncSession, batch, current_time: datetime):
+    """
+    In digest mode, also claim due messages to the batch's recipients that the
+    batch left out, so they go out in the same digest. With DIGEST_WINDOW_SECONDS
+    set, messages falling due within that window are sent early with them.
+    In sender mode only messages from the same sender are pulled in. At most
+    SCHEDULER_BATCH_SIZE companions are claimed, in fair-share order and within
+    the sender quotas, which they count against like any other claim.
+    """
+    if settings.DIGEST_MODE == "off" or not batch:
+        return []
+    window_end = current_time + timedelta(seconds=settings.DIGEST_WINDOW_SECONDS)
+    claimable = (
+        Message.is_delivered == False,  # noqa: E712
+        Message.is_dead_lettered == False,  # noqa: E712
+        func.coalesce(Message.next_attempt_at, Message.delivery_date) <= window_end,
+        or_(Message.claimed_until.is_(None), Message.claimed_until < current_time),
+    )
+    if settings.DIGEST_MODE == "sender":
+        claimable += (or_(*(
+            and_(Message.user_id == user_id, Message.recipient_email == recipient_email)
+            for user_id, recipient_email in {(msg.user_id, msg.recipient_email) for msg in batch}
+        )),)
+    else:
+        claimable += (Message.recipient_email.in_(list({msg.recipient_email for msg in batch})),)
+    return await _claim(db, claimable, current_time, settings.SCHEDULER_BATCH_SIZE)
+
+def group_into_digests(batch) -> List[list]:
+    """
+    Group a batch into units sent as one email: a digest per recipient (or per
+    sender and recipient) in digest mode, split into digests of at most
+    DIGEST_MAX_MESSAGES, otherwise one message per unit
+    """
+    if settings.DIGEST_MODE == "off":
+        return [[msg] for msg in batch]
+    digests: Dict[object, list] = defaultdict(list)
+    for msg in sorted(batch, key=lambda msg: (msg.delivery_date, msg.id)):
+        digests[_digest_key(msg)].append(msg)
+    size = settings.DIGEST_MAX_MESSAGES
+    return [messages[i:i + size] for messages in digests.values() for i in range(0, len(messages), size)]
+
+def group_by_domain(units: List[list]) -> List[Tuple[str, List[list]]]:
+    """
+    Split the units of a batch into per recipient domain groups of at most
+    DELIVERY_GROUP_SIZE emails, interleaved round-robin across domains so one
+    busy domain does not hold every worker while the others wait
+    """
+    by_domain: Dict[str, List[list]] = defaultdict(list)
+    for unit in units:
+        by_domain[recipient_domain(unit[0].recipient_email)].append(unit)
+    
+    chunked = {
+        domain: [
+            messages[i:i + settings.DELIVERY_GROUP_SIZE]
+            for i in range(0, len(messages), settings.DELIVERY_GROUP_SIZE)
+        ]
+        for domain, messages in by_domain.items()
+    }
+    groups = []
+    for round_groups in zip_longest(*chunked.values()):
+        for domain, group in zip(chunked, round_groups):
+            if group:
+                groups.append((domain, group))
+    return groups
+
+async def deliver_unit(db: AsyncSession, unit: list, connection: Optional[PooledConnection] = None) -> bool:
+    """Deliver a single message, or several as one digest, returning whether it was sent"""
+    if send_guard.breaker.open_remaining:
+        # The breaker opened while the batch was being delivered; don't queue up behind it
+        for msg in unit:
+            await release_paused(db, msg, "SMTP sending is paused by the circuit breaker")
+        return False
+    if len(unit) == 1:
+        return await deliver_message(db, unit[0], connection=connection)
+    return await deliver_digest(db, unit, connection=connection)
+
+async def deliver_group(db: AsyncSession, domain: str, units: List[list]):
+    """
+    Deliver emails that share a recipient domain over a single SMTP session,
+    within the domain's concurrency cap and send rate.
+
+    Delivery notifications are queued once the session is released: the
+    background queue sends them over the same connection pool, so queueing
+    while holding a connection could wait forever on a full queue.
+    """
+    sent = []
+    async with domain_throttle.session_slot(domain):
+        delivered = 0
+        try:
+            async with smtp_pool.connection() as connection:
+                for unit in units:
+                    await domain_throttle.acquire(domain)
+                    if await deliver_unit(db, unit, connection=connection):
+                        sent.extend(unit)
+                    delivered += 1
+        except Exception as e:
+            # Could not open a session; fall back to individual sends, which record failures
+            logger.error(f"SMTP session for {domain} failed: {str(e)}")
+            for unit in units[delivered:]:
+                await domain_throttle.acquire(domain)
+                if await deliver_unit(db, unit):
+                    sent.extend(unit)
+    await queue_delivery_notifications(sent)
+
+async def _delivery_worker(queue: asyncio.Queue, worker_number: int):
+    """
+    Consume domain groups from the queue and deliver them using a dedicated session
+    """
+    async with AsyncSessionLocal() as db:
+        while True:
+            domain, units = await queue.get()
+            try:
+                await deliver_group(db, domain, units)
+            except Exception as e:
+                logger.error(f"Delivery worker {worker_number} failed on a group for {domain}: {str(e)}", exc_info=True)
+            finally:
+                queue.task_done()
+
+def count_backlog(db: Session, current_time: datetime, limit: Optional[int] = None) -> int:
+    """
+    Count eligible messages that are overdue by more than CATCHUP_ON_TIME_SECONDS.
+    With a limit the count stops early, which is enough to detect a backlog.
+    Synchronous so status scripts can use it; the scheduler calls it via run_sync.
+    """
+    backlog = select(Message.id).where(
+        *due_conditions(current_time),
+        Message.delivery_date <= current_time - timedelta(seconds=settings.CATCHUP_ON_TIME_SECONDS),
+    )
+    if limit is not None:
+        backlog = backlog.limit(limit)
+    return db.execute(select(func.count()).select_from(backlog.subquery())).scalar_one()
+
+def get_backlog_status(db: Session, current_time: datetime) -> dict:
+    """
+    Summarise the delivery backlog and how fast it is being drained
+    """
+    rate_window = timedelta(seconds=settings.CATCHUP_RATE_WINDOW_SECONDS)
+    backlog = count_backlog(db, current_time)
+    recently_delivered = db.execute(
+        select(func.count()).where(Message.delivered_at >= current_time - rate_window)
+    ).scalar_one()
+    drain_rate = recently_delivered / rate_window.total_seconds()
+    return {
+        "backlog": backlog,
+        "catching_up": backlog > settings.CATCHUP_THRESHOLD,
+        "drain_rate": drain_rate,
+        "estimated_drain_seconds": backlog / drain_rate if drain_rate else None,
+        "oldest_due": db.execute(
+            select(func.min(Message.delivery_date)).where(*due_conditions(current_time))
+        ).scalar_one(),
+    }
+
+async def _renew_claims(messages):
+    """
+    Push the claim expiry of messages still claimed for this batch forward
+    every third of DELIVERY_CLAIM_TTL_SECONDS until cancelled, so throttling
+    and SMTP waits cannot let another worker claim and send them again
+    """
+    ttl = settings.DELIVERY_CLAIM_TTL_SECONDS
+    message_ids = [msg.id for msg in messages]
+    claim_tokens = list({msg.claimed_by for msg in messages})
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Message)
+                    .where(Message.id.in_(message_ids), Message.claimed_by.in_(claim_tokens))
+                    .values(claimed_until=ist_now() + timedelta(seconds=ttl))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Error renewing delivery claims: {str(e)}", exc_info=True)
+
+async def _deliver_claimed(db: AsyncSession, queue: asyncio.Queue, batch) -> int:
+    """
+    Hand a claimed batch to the delivery workers and wait until it is done,
+    renewing its claims meanwhile
+    """
+    logger.info(f"Claimed batch of {len(batch)} due messages")
+    companions = await claim_digest_companions(db, batch, ist_now())
+    if companions:
+        logger.info(f"Claimed {len(companions)} messages due within the digest window")
+    messages = list(batch) + list(companions)
+    for msg in messages:
+        logger.info(f"Will deliver message {msg.id}: '{msg.title}' to {msg.recipient_email} (scheduled for {msg.delivery_date})")
+    renewal = asyncio.create_task(_renew_claims(messages))
+    try:
+        for domain, units in group_by_domain(group_into_digests(messages)):
+            await queue.put((domain, units))
+        # Finish the batch before claiming more
+        await queue.join()
+    finally:
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+    return len(batch)
+
+async def _deliver_all_due(db: AsyncSession, queue: asyncio.Queue, current_time: datetime, **claim_kwargs) -> int:
+    """
+    Claim and deliver batches until nothing matching claim_kwargs is left
+    """
+    delivered_count = 0
+    while True:
+        batch = await claim_due_batch(db, current_time, **claim_kwargs)
+        if not batch:
+            return delivered_count
+        delivered_count += await _deliver_claimed(db, queue, batch)
+
+async def _catch_up(db: AsyncSession, queue: asyncio.Queue, backlog_size: int) -> int:
+    """
+    Drain a backlog oldest-first in rate-limited chunks.
+
+    Before every chunk the messages that became due in the last
+    CATCHUP_ON_TIME_SECONDS are delivered in full, so they keep going out on
+    time while the backlog is worked through at CATCHUP_RATE_PER_SECOND.
+    """
+    on_time = timedelta(seconds=settings.CATCHUP_ON_TIME_SECONDS)
+    started = time.monotonic()
+    drained = 0
+    while True:
+        chunk_started = time.monotonic()
+        current_time = ist_now()
+        await _deliver_all_due(db, queue, current_time, due_after=current_time - on_time)
+
+        chunk = await claim_due_batch(
+            db,
+            current_time,
+            batch_size=settings.CATCHUP_CHUNK_SIZE,
+            due_before=current_time - on_time,
+        )
+        if not chunk:
+            break
+        drained += await _deliver_claimed(db, queue, chunk)
+
+        elapsed = time.monotonic() - started
+        remaining = max(backlog_size - drained, 0)
+        logger.info(
+            f"Catch-up progress: {drained}/{backlog_size} drained, "
+            f"{drained / elapsed if elapsed else 0:.1f} msg/s, "
+            f"about {remaining / settings.CATCHUP_RATE_PER_SECOND:.0f}s remaining"
+        )
+        # Pace the chunks to the configured drain rate
+        await asyncio.sleep(max(len(chunk) / settings.CATCHUP_RATE_PER_SECOND - (time.monotonic() - chunk_started), 0))
+
+    logger.info(f"Catch-up finished, drained {drained} overdue messages")
+    return drained
+
+async def check_and_deliver_messages() -> Optional[datetime]:
     """
     Check for messages that need to be delivered and deliver them
+    using a bounded pool of concurrent delivery workers.
+
+    If more than CATCHUP_THRESHOLD messages are overdue, for example after
+    downtime, the scheduler switches to catch-up mode for this pass. Returns
+    when to run again if due messages were held back by sender quotas.
     """
     logger.info("Starting check for messages to deliver...")
     
+    # Bounded queue so the producer never runs more than one batch ahead of the workers
+    queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SCHEDULER_BATCH_SIZE)
+    workers = [
+        asyncio.create_task(_delivery_worker(queue, worker_number))
+        for worker_number in range(settings.SCHEDULER_MAX_CONCURRENCY)
+    ]
+    
+    flusher = asyncio.create_task(delivery_ledger.run_periodic_flush())
+    
     # Get a database session
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        # Get all undelivered messages regardless of delivery date first to see what's in the database
-        result = db.execute(
-            text("SELECT id, title, content, recipient_email, delivery_date, is_delivered FROM message")
-        )
-        all_messages = result.fetchall()
-        logger.info(f"Total messages in database: {len(all_messages)}")
-        for msg in all_messages:
-            delivery_date = parse_date(str(msg[4])) if msg[4] else None
-            logger.info(f"Message {msg[0]}: Title='{msg[1]}', Email='{msg[3]}', Date='{delivery_date}', Delivered={msg[5]}")
-        
-        # Now get the messages that need to be delivered
-        current_time = datetime.now(IST)
+        current_time = ist_now()
         logger.info(f"Current time (IST): {current_time}")
         
-        # Convert current_time to naive datetime for database comparison
-        current_time_naive = current_time.replace(tzinfo=None)
+        queued_count = 0
+        backlog_size = await db.run_sync(count_backlog, current_time, limit=settings.CATCHUP_THRESHOLD + 1)
+        if backlog_size > settings.CATCHUP_THRESHOLD:
+            backlog_size = await db.run_sync(count_backlog, current_time)
+            logger.warning(f"{backlog_size} messages are overdue, entering catch-up mode")
+            queued_count += await _catch_up(db, queue, backlog_size)
+            current_time = ist_now()
         
-        result = db.execute(
-            text("""
-                SELECT id, title, content, recipient_email, delivery_date 
-                FROM message 
-                WHERE is_delivered = FALSE 
-                AND delivery_date <= :current_time
-                AND recipient_email IS NOT NULL
-            """),
-            {"current_time": current_time_naive}
-        )
-        messages_to_deliver = result.fetchall()
+        queued_count += await _deliver_all_due(db, queue, current_time)
+        
+        logger.info(f"Processed {queued_count} due messages with {len(workers)} workers")
         
-        logger.info(f"Found {len(messages_to_deliver)} messages to deliver")
-        for msg in messages_to_deliver:
-            delivery_date = parse_date(str(msg[4])) if msg[4] else None
-            logger.info(f"Will deliver message {msg[0]}: '{msg[1]}' to {msg[3]} (scheduled for {delivery_date})")
-            await deliver_message(db, msg)
+        if send_guard.breaker.open_remaining:
+            retry_at = ist_now() + timedelta(seconds=send_guard.breaker.open_remaining)
+            logger.warning(f"SMTP sending is paused by the circuit breaker, next pass at {retry_at}")
+            return retry_at
+        if (await db.execute(select(Message.id).where(*due_conditions(ist_now())).limit(1))).first():
+            retry_at = fair_share.next_interval()
+            logger.info(f"Due messages are waiting for sender quotas, next pass at {retry_at}")
+            return retry_at
             
     except Exception as e:
         logger.error(f"Error checking for messages to deliver: {str(e)}", exc_info=True)
     finally:
-        db.close()
+        for worker in workers:
+            worker.cancel()
+        flusher.cancel()
+        await asyncio.gather(*workers, flusher, return_exceptions=True)
+        await delivery_ledger.flush(db)
+        await db.close()
 
-async def deliver_message(db: Session, message_data):
+async def deliver_message(db: AsyncSession, message_data, connection: Optional[PooledConnection] = None) -> bool:
     """
-    Deliver a message to its recipient
+    Deliver a message to its recipient, returning whether it was sent
     """
     message_id = message_data[0]
     title = message_data[1]
@@ -95,77 +498,182 @@ async def deliver_message(db: Session, message_data):
         
         if not recipient_email:
             logger.warning(f"Message {message_id} has no recipient email, skipping delivery")
-            return
+            return False
             
-        # Send the message content
-        email_schema = EmailSchema(
-            email=[recipient_email],
-            subject=f"Your AfterLife Message: {title}",
-            body=content,
-            html=f"""
-            <html>
-                <body>
-                    <h2>{title}</h2>
-                    <p>{content}</p>
-                    <p>This message was scheduled for delivery on {delivery_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_date else 'Unknown'} IST</p>
-                </body>
-            </html>
-            """
-        )
-        
-        # Send the email
         logger.info(f"Attempting to send email for message {message_id}")
-        success = await send_email(email_schema)
+        if message_data.rendered_email:
+            # Rendered when the message was saved; only the send-time headers are added
+            success = await send_prerendered_email(recipient_email, message_data.rendered_email, connection)
+        else:
+            # Saved before pre-rendering existed, render it now like prerender_message would
+            email_schema = build_message_email(
+                title, content, recipient_email, delivery_date,
+                sender_name=message_data.sender_name,
+                generation_settings=message_data.generation_settings
+            )
+            success = await send_email(email_schema, connection=connection)
         
         if success:
             logger.info(f"Successfully sent email for message {message_id} to {recipient_email}")
-            
-            # Mark the message as delivered
-            db.execute(
-                text("UPDATE message SET is_delivered = TRUE WHERE id = :id"),
-                {"id": message_id}
-            )
-            db.commit()
-            logger.info(f"Marked message {message_id} as delivered")
-            
-            # Only send delivery notification if enabled
-            if settings.SEND_NOTIFICATION_EMAILS:
-                # Create a background tasks object
-                background_tasks = BackgroundTasks()
-                
-                # Send a delivery notification
-                await send_message_delivery_notification_background(
-                    background_tasks=background_tasks,
-                    recipient_email=recipient_email,
-                    message_title=title,
-                    delivery_date=delivery_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_date else 'Unknown'
-                )
-                logger.info(f"Sent delivery notification for message {message_id}")
-            else:
-                logger.info(f"Skipping delivery notification for message {message_id} (notifications disabled)")
-        else:
-            logger.error(f"Failed to send email for message {message_id} to {recipient_email}")
+            await record_delivered(db, message_data)
+            return True
+        logger.error(f"Failed to send email for message {message_id} to {recipient_email}")
+        await record_delivery_failure(db, message_data, "Email could not be sent")
         
+    except SendPausedError as e:
+        await release_paused(db, message_data, str(e))
     except Exception as e:
         logger.error(f"Error delivering message {message_id}: {str(e)}", exc_info=True)
-        # Don't mark the message as delivered if there was an error
-        db.execute(
-            text("UPDATE message SET is_delivered = FALSE WHERE id = :id"),
-            {"id": message_id}
+        await db.rollback()
+        await record_delivery_failure(db, message_data, str(e))
+    return False
+
+async def deliver_digest(db: AsyncSession, messages, connection: Optional[PooledConnection] = None) -> bool:
+    """
+    Deliver several messages to one recipient as a single digest email,
+    returning whether it was sent
+    """
+    message_ids = [msg.id for msg in messages]
+    recipient_email = messages[0].recipient_email
+    try:
+        logger.info(f"Sending digest of messages {message_ids} to {recipient_email}")
+        success = await send_email(build_digest_email(messages), connection=connection)
+        error = "Email could not be sent"
+    except SendPausedError as e:
+        for msg in messages:
+            await release_paused(db, msg, str(e))
+        return False
+    except Exception as e:
+        logger.error(f"Error delivering digest of messages {message_ids}: {str(e)}", exc_info=True)
+        await db.rollback()
+        success, error = False, str(e)
+    
+    for msg in messages:
+        if success:
+            await record_delivered(db, msg)
+        else:
+            await record_delivery_failure(db, msg, error)
+    return success
+
+async def record_delivered(db: AsyncSession, message_data):
+    """
+    Journal a sent message
+    """
+    # The delivery is written to the database with the next flush
+    await delivery_ledger.record_delivered(message_data.id, ist_now(), db)
+    logger.info(f"Recorded message {message_data.id} as delivered")
+
+async def queue_delivery_notifications(messages):
+    """
+    Queue the delivery notifications for sent messages, all in one go
+    """
+    # Only send delivery notifications if enabled
+    if not settings.SEND_NOTIFICATION_EMAILS:
+        for message_data in messages:
+            logger.info(f"Skipping delivery notification for message {message_data.id} (notifications disabled)")
+        return
+    await send_message_delivery_notifications_background([
+        (
+            message_data.recipient_email,
+            message_data.title,
+            message_data.delivery_date.strftime('%Y-%m-%d %H:%M:%S') if message_data.delivery_date else 'Unknown'
         )
-        db.commit()
+        for message_data in messages
+    ])
+    for message_data in messages:
+        logger.info(f"Queued delivery notification for message {message_data.id}")
+
+def retry_delay(attempt_count: int) -> timedelta:
+    """
+    Exponential backoff with jitter for the given number of failed attempts.
+    Half of the delay is fixed and half random, so retries of messages that
+    failed together spread out instead of hitting the server at the same time.
+    """
+    delay = min(
+        settings.DELIVERY_RETRY_BASE_SECONDS * 2 ** (attempt_count - 1),
+        settings.DELIVERY_RETRY_MAX_SECONDS,
+    )
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+async def record_delivery_failure(db: AsyncSession, message_data, error: str):
+    """
+    Record a failed delivery attempt; the claim is released when it is flushed.
+
+    The message becomes eligible again after a backoff delay, or is dead-lettered
+    once it has failed DELIVERY_MAX_ATTEMPTS times.
+    """
+    message_id = message_data.id
+    attempt_count = (message_data.attempt_count or 0) + 1
+    dead_lettered = attempt_count >= settings.DELIVERY_MAX_ATTEMPTS
+    next_attempt_at = None if dead_lettered else ist_now() + retry_delay(attempt_count)
+    
+    await delivery_ledger.record_failed(
+        message_id,
+        message_data.claimed_by,
+        {
+            "attempt_count": attempt_count,
+            "next_attempt_at": next_attempt_at,
+            "last_error": error[:500],
+            "is_dead_lettered": dead_lettered,
+        },
+        db,
+    )
+    
+    if dead_lettered:
+        logger.error(f"Message {message_id} dead-lettered after {attempt_count} failed attempts: {error}")
+    else:
+        logger.warning(f"Message {message_id} failed attempt {attempt_count}, retrying at {next_attempt_at}")
+        delivery_timer.notify_message_changed(message_id, next_attempt_at)
+
+async def release_paused(db: AsyncSession, message_data, error: str):
+    """
+    Release the claim on a message the send guard held back. It was never
+    sent, so the attempt is not counted; it is retried once the breaker lets
+    sends through again.
+    """
+    next_attempt_at = ist_now() + timedelta(
+        seconds=send_guard.breaker.open_remaining or settings.SMTP_BREAKER_OPEN_SECONDS
+    )
+    await delivery_ledger.record_failed(
+        message_data.id,
+        message_data.claimed_by,
+        {
+            "attempt_count": message_data.attempt_count or 0,
+            "next_attempt_at": next_attempt_at,
+            "last_error": error[:500],
+            "is_dead_lettered": False,
+        },
+        db,
+    )
+    logger.warning(f"Message {message_data.id} held back by the SMTP send guard, retrying at {next_attempt_at}")
+    delivery_timer.notify_message_changed(message_data.id, next_attempt_at)
 
 async def start_scheduler():
     """
-    Start the message scheduler
+    Start the message scheduler.
+
+    Only the instance holding the scheduler lease runs the delivery timer; the
+    others wait and take over if the leader stops renewing it.
     """
     logger.info("Starting message scheduler...")
-    
-    while True:
-        try:
-            await check_and_deliver_messages()
-        except Exception as e:
-            logger.error(f"Error in scheduler loop: {str(e)}", exc_info=True)
-        
-        logger.info("Waiting 60 seconds before next check...")
-        await asyncio.sleep(60) 
\ No newline at end of file
+    await scheduler_lease.run_as_leader(lambda: delivery_timer.run(check_and_deliver_messages))
+
+async def start_delivery_worker():
+    """
+    Run an additional delivery worker.
+
+    Workers claim their batches, so any number of them can run next to the
+    leader without sending a message twice.
+    """
+    logger.info(f"Starting delivery worker {WORKER_ID}...")
+    await delivery_timer.run(check_and_deliver_messages)
+
+async def deliver_due_messages_once() -> bool:
+    """
+    Run a single delivery pass if no other scheduler instance is active.
+    The notifications it queued are sent by the job workers.
+    """
+    try:
+        return await scheduler_lease.run_as_leader(check_and_deliver_messages, wait=False)
+    finally:
+        await async_engine.dispose()
@@ -0,0 +1,161 @@
+"""
+Concurrent request benchmark for the async database layer.
+
+Sends N create-message requests with a given concurrency to the real
+POST /api/v1/messages/ endpoint, which uses an AsyncSession, and to a copy of
+it that uses the synchronous Session from inside an async endpoint as the
+endpoint used to. While each run is going, GET /health is probed every 10ms
+and the event loop's scheduling lag is sampled, which shows how much the
+blocking variant stalls everything else in the process.
+
+Runs in-process against a throwaway SQLite database through httpx's ASGI
+transport.
+
+    python benchmarks/api_concurrency.py [--count 1000] [--concurrency 50]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROBE_INTERVAL_SECONDS = 0.01
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="Requests per variant")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+    return parser.parse_args()
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="afterlife-benchmark-")
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        SCHEDULER_ENABLED="False",
+        SEND_NOTIFICATION_EMAILS="False",
+    )
+
+    import asyncio
+    from typing import Any
+    import httpx
+    from fastapi import APIRouter, Depends
+    from sqlalchemy.orm import Session
+    from app.api import deps
+    from app.core.security import create_access_token
+    from app.db.session import SessionLocal, async_engine
+    from app.main import app
+    from app.models.message import Message as MessageModel
+    from app.models.user import User as UserModel
+    from app.schemas.message import Message, MessageCreate
+    from app.services.message_email import prerender_message
+
+    blocking = APIRouter()
+
+    @blocking.post("/", response_model=Message)
+    async def create_message_blocking(
+        *,
+        db: Session = Depends(deps.get_db),
+        message_in: MessageCreate,
+        current_user: UserModel = Depends(deps.get_current_active_user),
+    ) -> Any:
+        # create_message as it was before the async session
+        message = MessageModel(**message_in.dict(), user_id=current_user.id)
+        prerender_message(message, current_user.full_name)
+        db.add(message)
+        db.commit()
+        db.refresh(message)
+        return message
+
+    app.include_router(blocking, prefix="/benchmark/blocking-messages")
+
+    db = SessionLocal()
+    user = UserModel(email="sender@example.com", hashed_password="unused", full_name="Sender")
+    db.add(user)
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(user.id)}"}
+    db.close()
+
+    body = {
+        "title": "Benchmark message",
+        "content": "Some words I wanted you to have.\n" * 20,
+        "delivery_date": "2030-01-01T09:00:00",
+        "delivery_method": "email",
+        "recipient_email": "recipient@example.com",
+    }
+
+    async def run(path: str) -> dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            semaphore = asyncio.Semaphore(args.concurrency)
+            latencies, probes, lags = [], [], []
+            done = asyncio.Event()
+
+            async def request():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(path, json=body, headers=headers)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+
+            async def probe():
+                while not done.is_set():
+                    started = time.perf_counter()
+                    await client.get("/health")
+                    probes.append(time.perf_counter() - started)
+                    await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+
+            async def sample_lag():
+                while not done.is_set():
+                    started = time.perf_counter()
+                    await asyncio.sleep(PROBE_INTERVAL_SECONDS)
+                    lags.append(time.perf_counter() - started - PROBE_INTERVAL_SECONDS)
+
+            background = [asyncio.create_task(probe()), asyncio.create_task(sample_lag())]
+            started = time.perf_counter()
+            await asyncio.gather(*(request() for _ in range(args.count)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await asyncio.gather(*background)
+        return {
+            "rate": args.count / elapsed,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "probe_p99": percentile(probes, 0.99) if probes else float("nan"),
+            "max_lag": max(lags) if lags else float("nan"),
+        }
+
+    async def run_all():
+        # Warm up both paths, the first requests pay for connecting and compiling
+        for path in ("/benchmark/blocking-messages/", "/api/v1/messages/"):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+                (await client.post(path, json=body, headers=headers)).raise_for_status()
+        try:
+            return {
+                "sync Session": await run("/benchmark/blocking-messages/"),
+                "AsyncSession": await run("/api/v1/messages/"),
+            }
+        finally:
+            await async_engine.dispose()
+
+    results = asyncio.run(run_all())
+    print(f"{args.count} create requests, {args.concurrency} concurrent")
+    print(f"{'':<14}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'/health p99 ms':>16}{'max loop lag ms':>17}")
+    for name, result in results.items():
+        print(
+            f"{name:<14}{result['rate']:>9.1f}{result['p50'] * 1000:>9.1f}{result['p99'] * 1000:>9.1f}"
+            f"{result['probe_p99'] * 1000:>16.1f}{result['max_lag'] * 1000:>17.1f}"
+        )
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
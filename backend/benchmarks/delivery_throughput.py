@@ -0,0 +1,195 @@
+"""
+End-to-end delivery benchmark.
+
+Seeds N messages that are due now into a fresh SQLite database, runs the
+scheduler's delivery pass against the local SMTP sink and reports:
+
+- deliveries per second
+- p50/p99/max lateness, from the moment every message became due to its arrival at the sink
+- database commits made during delivery
+- SMTP connections opened
+
+Everything runs offline in one process. Sender quotas and domain throttling
+are lifted unless set in the environment, so the numbers show what the
+pipeline itself can do; delivery notifications are off unless --notifications
+is given. Exits with status 1 if a message is lost or sent twice, or if
+--min-rate is given and throughput falls below it, so it can guard against
+regressions. Needs aiosmtpd (pip install -r requirements-dev.txt).
+
+    python benchmarks/delivery_throughput.py [--count 2000] [--senders 10] [--domains 20]
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=2000, help="Messages to deliver")
+    parser.add_argument("--senders", type=int, default=10, help="Users the messages are spread over")
+    parser.add_argument("--domains", type=int, default=20, help="Recipient domains the messages are spread over")
+    parser.add_argument("--port", type=int, default=8025, help="Port for the SMTP sink")
+    parser.add_argument("--sink-delay", type=float, default=0.0, help="Seconds the sink takes per message")
+    parser.add_argument("--no-prerender", action="store_true", help="Render emails at delivery time")
+    parser.add_argument("--notifications", action="store_true", help="Also send delivery notifications")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's INFO logs")
+    parser.add_argument("--min-rate", type=float, help="Fail if fewer deliveries per second are made")
+    return parser.parse_args()
+
+def configure(args, workdir: str):
+    # Must run before the app is imported, which reads its settings once
+    os.environ.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        DELIVERY_JOURNAL_DIR=os.path.join(workdir, "delivery_journal"),
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(args.port),
+        MAIL_SSL="False",
+        MAIL_TLS="False",
+        USE_CREDENTIALS="False",
+        MAIL_USERNAME="benchmark",
+        MAIL_PASSWORD="benchmark",
+        MAIL_FROM="benchmark@example.com",
+        SEND_NOTIFICATION_EMAILS=str(args.notifications),
+    )
+    os.environ.setdefault("SENDER_QUOTA_PER_INTERVAL", "0")
+    os.environ.setdefault("DOMAIN_RATE_PER_SECOND", "100000")
+    os.environ.setdefault("DOMAIN_BURST", "100000")
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="afterlife-benchmark-")
+    configure(args, workdir)
+
+    import asyncio
+    from sqlalchemy import event, func, select, update
+    from app.db.session import SessionLocal, async_engine, engine
+    from app.db.init_db import sync_schema
+    from app.models.job import Job
+    from app.models.message import Message
+    from app.models.user import User
+    from app.core.email import NOTIFICATION_SUBJECTS
+    from app.core.smtp_pool import smtp_pool
+    from app.services.delivery_timer import ist_now
+    from app.services.message_email import prerender_message
+    from app.services.job_queue import JobWorker
+    from app.services.scheduler import check_and_deliver_messages
+    from benchmarks.smtp_sink import SMTPSink
+
+    sync_schema()
+    db = SessionLocal()
+    users = [
+        User(email=f"sender{i}@example.com", hashed_password="x", full_name=f"Sender {i}")
+        for i in range(args.senders)
+    ]
+    db.add_all(users)
+    db.commit()
+
+    for i in range(args.count):
+        message = Message(
+            title=f"Benchmark message {i}",
+            content="Some words I wanted you to have.\n" * 20,
+            delivery_date=ist_now(),
+            delivery_method="email",
+            recipient_email=f"recipient{i}@domain{i % args.domains}.example.com",
+            user_id=users[i % args.senders].id,
+        )
+        if not args.no_prerender:
+            prerender_message(message, users[i % args.senders].full_name)
+        db.add(message)
+    db.commit()
+    print(f"Seeded {args.count} messages from {args.senders} senders to {args.domains} domains")
+
+    # Make every message due at the same moment, right before delivery starts
+    db.execute(update(Message).values(delivery_date=ist_now()))
+    due_at = time.time()
+    db.commit()
+    db.close()
+
+    commits = Counter()
+    for counted_engine in (engine, async_engine.sync_engine):
+        event.listen(counted_engine, "commit", lambda conn: commits.update(["commit"]))
+
+    def count(model, *conditions):
+        with SessionLocal() as session:
+            return session.execute(select(func.count()).select_from(model).where(*conditions)).scalar()
+
+    async def run():
+        passes = 0
+        # Delivery notifications are email.send jobs, sent by a job worker as they are queued
+        worker = asyncio.create_task(JobWorker(lanes=["critical"]).run())
+        try:
+            while True:
+                passes += 1
+                await check_and_deliver_messages()
+                if not count(Message, Message.is_delivered == False) or passes >= 10:  # noqa: E712
+                    break
+            delivered_by = time.time()
+            # Failed notifications are only retried much later, stop waiting for them after a while
+            deadline = time.time() + 30
+            while count(Job, Job.status.in_(["queued", "running"])) and time.time() < deadline:
+                await asyncio.sleep(0.05)
+            return passes, delivered_by
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+            await smtp_pool.close()
+            await async_engine.dispose()
+
+    with SMTPSink(port=args.port, delay=args.sink_delay) as sink:
+        started = time.time()
+        passes, delivered_by = asyncio.run(run())
+        elapsed = delivered_by - started
+        drained = time.time() - delivered_by
+
+    prefix, _, suffix = NOTIFICATION_SUBJECTS["delivery_notification"].partition("{message_title}")
+    notifications = 0
+    received = Counter()
+    arrivals = {}
+    for message in sink.received:
+        if message.subject.startswith(prefix) and message.subject.endswith(suffix):
+            notifications += 1
+            continue
+        for recipient in message.recipients:
+            received[recipient] += 1
+            arrivals.setdefault(recipient, message.received_at)
+    delivered = list(arrivals)
+    lateness = [arrivals[recipient] - due_at for recipient in delivered]
+    duplicates = sum(count - 1 for count in received.values())
+    missing = args.count - len(delivered)
+    rate = len(delivered) / elapsed if elapsed else 0.0
+
+    print(f"Delivered:         {len(delivered)}/{args.count} in {elapsed:.2f}s over {passes} pass(es)")
+    print(f"Throughput:        {rate:.1f} deliveries/s")
+    if lateness:
+        print(
+            f"Lateness:          p50 {percentile(lateness, 0.5):.2f}s, "
+            f"p99 {percentile(lateness, 0.99):.2f}s, max {max(lateness):.2f}s"
+        )
+    print(f"DB commits:        {commits['commit']} ({commits['commit'] / max(len(delivered), 1):.3f} per message)")
+    print(f"SMTP connections:  {smtp_pool.connections_opened} opened, {sink.sessions} sessions at the sink")
+    if args.notifications:
+        print(f"Notifications:     {notifications}, all sent {drained:.2f}s after the last delivery")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    failed = False
+    if missing or duplicates:
+        print(f"FAIL: {missing} messages missing, {duplicates} sent twice")
+        failed = True
+    if args.min_rate is not None and rate < args.min_rate:
+        print(f"FAIL: {rate:.1f} deliveries/s is below --min-rate {args.min_rate}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
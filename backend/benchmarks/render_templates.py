@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for email rendering.
+
+Renders N message emails with the precompiled templates and compares that
+with looking the HTML template up through a Jinja environment on every send,
+as EmailService used to, and with compiling it on every send, which is what
+a fresh environment per sender costs. Precompiled HTML is auto-escaped, the
+other two are not.
+
+    python benchmarks/render_templates.py [--count 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemLoader
+from app.core.templates import EmailTemplates, TEMPLATE_DIR
+
+def sample(i: int) -> dict:
+    return {
+        "title": f"Message <{i}> for you & yours",
+        "content": "Some words I wanted you to have.\n" * 20,
+        "delivery_date": "2030-01-01 09:00:00",
+    }
+
+def bench_precompiled(count: int, parts: str) -> float:
+    templates = EmailTemplates()
+    start = time.perf_counter()
+    if parts == "html":
+        template = templates._templates["email_template"]["html"]
+        for i in range(count):
+            template.render(**sample(i))
+    else:
+        for i in range(count):
+            templates.render("email_template", **sample(i))
+    return time.perf_counter() - start
+
+def bench_lookup_per_send(count: int) -> float:
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    start = time.perf_counter()
+    for i in range(count):
+        env.get_template("email_template.html").render(**sample(i))
+    return time.perf_counter() - start
+
+def bench_compile_per_send(count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        Environment(loader=FileSystemLoader(TEMPLATE_DIR)).get_template("email_template.html").render(**sample(i))
+    return time.perf_counter() - start
+
+def bench_startup() -> float:
+    start = time.perf_counter()
+    EmailTemplates()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    # The per-send compile case is slow, so it runs on a tenth of the messages
+    compile_count = max(args.count // 10, 1)
+    runs = (
+        ("precompiled, html part", args.count, lambda: bench_precompiled(args.count, "html")),
+        ("precompiled, text + html", args.count, lambda: bench_precompiled(args.count, "both")),
+        ("get_template per send, html", args.count, lambda: bench_lookup_per_send(args.count)),
+        ("new environment per send, html", compile_count, lambda: bench_compile_per_send(compile_count)),
+    )
+    print(f"Compiling all templates once: {bench_startup() * 1e3:.1f}ms")
+    for name, count, bench in runs:
+        elapsed = bench()
+        print(f"{name:32} {count:6} emails {elapsed:7.3f}s  {elapsed / count * 1e6:8.1f}us per email")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Local SMTP sink for benchmarks and offline testing.
+
+Accepts every message on a local port and remembers who it was for and when
+it arrived, without delivering anything. It can also slow down or reject a
+share of the messages, to see how the scheduler and the SMTP send guard react
+to a degraded server. Needs aiosmtpd (pip install -r requirements-dev.txt).
+
+Run it on its own and point MAIL_SERVER/MAIL_PORT at it (with MAIL_SSL,
+MAIL_TLS and USE_CREDENTIALS set to False):
+
+    python benchmarks/smtp_sink.py [--port 8025] [--delay 0.05] [--fail-rate 0.1]
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from email.parser import BytesHeaderParser
+from typing import List, NamedTuple
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    raise SystemExit("The SMTP sink needs aiosmtpd: pip install -r requirements-dev.txt")
+
+class ReceivedMessage(NamedTuple):
+    recipients: List[str]
+    subject: str
+    received_at: float  # time.time() when the message was accepted
+    size: int
+
+class SMTPSink:
+    """
+    In-process SMTP server recording every message it accepts.
+
+    delay is added to every DATA command; fail_rate of the messages are
+    answered with a temporary 451 error instead of being accepted.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8025, delay: float = 0.0, fail_rate: float = 0.0):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.received: List[ReceivedMessage] = []
+        self.rejected = 0
+        self.sessions = 0
+        self._lock = threading.Lock()
+        self._controller = Controller(self, hostname=host, port=port)
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        session.host_name = hostname
+        with self._lock:
+            self.sessions += 1
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_rate and random.random() < self.fail_rate:
+            with self._lock:
+                self.rejected += 1
+            return "451 Temporary failure, try again later"
+        subject = BytesHeaderParser().parsebytes(envelope.original_content or envelope.content).get("Subject", "")
+        with self._lock:
+            self.received.append(
+                ReceivedMessage(list(envelope.rcpt_tos), str(subject), time.time(), len(envelope.content))
+            )
+        return "250 Message accepted"
+
+    def start(self):
+        self._controller.start()
+
+    def stop(self):
+        self._controller.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds added to every message")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of messages rejected with 451")
+    args = parser.parse_args()
+
+    with SMTPSink(args.host, args.port, args.delay, args.fail_rate) as sink:
+        print(f"SMTP sink listening on {args.host}:{args.port}, Ctrl+C to stop")
+        last = 0
+        try:
+            while True:
+                time.sleep(1)
+                count = len(sink.received)
+                if count != last:
+                    print(f"{count} accepted ({count - last}/s), {sink.rejected} rejected, {sink.sessions} sessions")
+                    last = count
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import logging
 import sys
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
 
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db.session import SessionLocal
-from sqlalchemy import text
+from app.core.config import settings
+from app.models.message import Message
+from app.services.scheduler import due_conditions, get_backlog_status
+from sqlalchemy import func, select
 
 # Set up logging
 logging.basicConfig(
@@ -20,18 +23,8 @@ logger = logging.getLogger(__name__)
 # Set timezone to IST
 IST = pytz.timezone('Asia/Kolkata')
 
-def parse_date(date_str):
-    """Parse a date string into a datetime object"""
-    if not date_str:
-        return None
-    try:
-        return datetime.strptime(str(date_str), '%Y-%m-%d %H:%M:%S')
-    except:
-        try:
-            return datetime.strptime(str(date_str), '%Y-%m-%d %H:%M:%S.%f')
-        except:
-            logger.error(f"Could not parse date string: {date_str}")
-            return None
+# Number of overdue messages listed in the report
+OVERDUE_DISPLAY_LIMIT = 20
 
 def check_scheduler_status():
     """
@@ -46,44 +39,49 @@ def check_scheduler_status():
     # Get a database session
     db = SessionLocal()
     try:
-        # Get all messages
-        result = db.execute(
-            text("SELECT id, title, content, recipient_email, delivery_date, is_delivered FROM message")
-        )
-        all_messages = result.fetchall()
-        
-        logger.info(f"Total messages in database: {len(all_messages)}")
-        
-        # Count pending messages
-        pending_messages = [msg for msg in all_messages if not msg[5]]  # is_delivered = False
-        logger.info(f"Pending messages: {len(pending_messages)}")
-        
-        # Count overdue messages
         current_time_naive = current_time.replace(tzinfo=None)
-        overdue_messages = []
         
-        for msg in pending_messages:
-            delivery_date = parse_date(msg[4])
-            if delivery_date and delivery_date <= current_time_naive:
-                overdue_messages.append(msg)
-                
-        logger.info(f"Overdue messages: {len(overdue_messages)}")
+        # Aggregate counts only, so the check stays cheap on large tables
+        total, delivered, dead_lettered = db.execute(
+            select(
+                func.count(),
+                func.count().filter(Message.is_delivered == True),  # noqa: E712
+                func.count().filter(Message.is_dead_lettered == True),  # noqa: E712
+            )
+        ).one()
+        logger.info(f"Total messages in database: {total}")
+        logger.info(f"Delivered messages: {delivered}")
+        logger.info(f"Pending messages: {total - delivered}")
+        logger.info(f"Dead-lettered messages: {dead_lettered}")
+        
+        overdue_count = db.execute(
+            select(func.count()).where(*due_conditions(current_time_naive))
+        ).scalar_one()
+        logger.info(f"Overdue messages: {overdue_count}")
         
-        # Display all messages
-        logger.info("All messages:")
-        for msg in all_messages:
-            delivery_date = parse_date(msg[4])
-            delivery_date_str = delivery_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_date else 'None'
-            status = "Delivered" if msg[5] else "Pending"
-            logger.info(f"ID: {msg[0]}, Title: '{msg[1]}', Email: {msg[3]}, Date: {delivery_date_str}, Status: {status}")
+        # Backlog and drain progress
+        status = get_backlog_status(db, current_time_naive)
+        mode = "catch-up" if status["catching_up"] else "normal"
+        logger.info(f"Scheduler mode: {mode}")
+        logger.info(f"Backlog: {status['backlog']} messages (oldest due {status['oldest_due']})")
+        logger.info(f"Drain rate: {status['drain_rate']:.2f} messages/s over the last {settings.CATCHUP_RATE_WINDOW_SECONDS}s")
+        if status["estimated_drain_seconds"] is not None:
+            logger.info(f"Estimated time to drain backlog: {timedelta(seconds=int(status['estimated_drain_seconds']))}")
+        elif status["backlog"]:
+            logger.info("Estimated time to drain backlog: unknown (nothing delivered recently)")
         
-        # Display overdue messages
+        # Display the oldest overdue messages
+        overdue_messages = db.execute(
+            select(Message.id, Message.title, Message.recipient_email, Message.delivery_date, Message.attempt_count)
+            .where(*due_conditions(current_time_naive))
+            .order_by(Message.delivery_date, Message.id)
+            .limit(OVERDUE_DISPLAY_LIMIT)
+        ).all()
         if overdue_messages:
-            logger.info("Overdue messages that should be delivered:")
+            logger.info(f"Oldest overdue messages that should be delivered (up to {OVERDUE_DISPLAY_LIMIT}):")
             for msg in overdue_messages:
-                delivery_date = parse_date(msg[4])
-                delivery_date_str = delivery_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_date else 'None'
-                logger.info(f"ID: {msg[0]}, Title: '{msg[1]}', Email: {msg[3]}, Date: {delivery_date_str}")
+                delivery_date_str = msg.delivery_date.strftime('%Y-%m-%d %H:%M:%S') if msg.delivery_date else 'None'
+                logger.info(f"ID: {msg.id}, Title: '{msg.title}', Email: {msg.recipient_email}, Date: {delivery_date_str}, Attempts: {msg.attempt_count}")
         
     except Exception as e:
         logger.error(f"Error checking scheduler status: {str(e)}", exc_info=True)
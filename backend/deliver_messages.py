@@ -1,6 +1,7 @@
 import asyncio
 import logging
-from app.services.scheduler import check_and_deliver_messages
+from app.db.init_db import sync_schema
+from app.services.scheduler import deliver_due_messages_once
 
 # Set up logging
 logging.basicConfig(
@@ -13,8 +14,11 @@ async def deliver_messages():
     """
     Manually trigger message delivery
     """
+    sync_schema()
     logger.info("Starting manual message delivery...")
-    await check_and_deliver_messages()
+    if not await deliver_due_messages_once():
+        logger.warning("Another scheduler instance is active, skipping manual delivery")
+        return
     logger.info("Message delivery completed")
 
 if __name__ == "__main__":
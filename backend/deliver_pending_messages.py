@@ -6,7 +6,8 @@ import logging
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.services.scheduler import check_and_deliver_messages
+from app.db.init_db import sync_schema
+from app.services.scheduler import deliver_due_messages_once
 
 # Set up logging
 logging.basicConfig(
@@ -22,8 +23,11 @@ async def deliver_pending_messages():
     """
     Manually trigger the delivery of pending messages
     """
+    sync_schema()
     logger.info("Manually triggering delivery of pending messages...")
-    await check_and_deliver_messages()
+    if not await deliver_due_messages_once():
+        logger.warning("Another scheduler instance is active, skipping manual delivery")
+        return
     logger.info("Finished checking for pending messages.")
 
 if __name__ == "__main__":
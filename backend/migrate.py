@@ -0,0 +1,27 @@
+import logging
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.init_db import sync_schema
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def migrate():
+    """
+    Bring the database schema up to date. Run it once before starting several
+    API workers with SYNC_SCHEMA_ON_STARTUP off.
+    """
+    logger.info("Synchronising the database schema...")
+    sync_schema()
+    logger.info("Database schema is up to date")
+
+if __name__ == "__main__":
+    migrate()
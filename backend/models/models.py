@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Text, Boolean, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -46,6 +46,10 @@ class Recipient(BaseModel):
 
 class Message(BaseModel):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a sender's messages in /messages/list
+        Index("ix_messages_sender_created", "sender_id", "created_at", "id"),
+    )
 
     sender_id = Column(Integer, ForeignKey("users.id"))
     recipient_id = Column(Integer, ForeignKey("recipients.id"))
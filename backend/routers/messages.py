@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Response
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List, Any
+from typing import List, Any, Optional
 from datetime import datetime
+import base64
+import binascii
 from ..core import security
 from ..db.session import get_db
 from ..models import models
@@ -82,17 +85,39 @@ async def upload_media(
     
     return {"media_url": media_url}
 
+def _encode_cursor(message: models.Message) -> str:
+    return base64.urlsafe_b64encode(f"{message.created_at.isoformat()}|{message.id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/list", response_model=List[message_schemas.Message])
 def list_messages(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
-    List all messages for the current user
+    List the current user's messages, oldest first.
+    The X-Next-Cursor response header holds the cursor for the next page.
     """
-    messages = db.query(models.Message).filter(
+    query = db.query(models.Message).filter(
         models.Message.sender_id == current_user.id
-    ).all()
+    )
+    if cursor:
+        query = query.filter(
+            tuple_(models.Message.created_at, models.Message.id) > tuple_(*_decode_cursor(cursor))
+        )
+    messages = query.order_by(models.Message.created_at, models.Message.id).limit(limit + 1).all()
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(messages[-1])
     return messages
 
 @router.get("/{message_id}", response_model=message_schemas.Message)
@@ -0,0 +1,4 @@
+@echo off
+echo Starting AfterLife Message Platform delivery worker...
+echo Run several of these to share delivery of due messages.
+python run_delivery_worker.py
\ No newline at end of file
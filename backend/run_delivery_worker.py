@@ -0,0 +1,36 @@
+import asyncio
+import logging
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.init_db import sync_schema
+from app.services.scheduler import start_delivery_worker
+from app.db.session import async_engine
+from app.services.delivery_timer import delivery_timer
+from app.core.config import settings
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def run_delivery_worker():
+    """
+    Run a delivery worker alongside the scheduler to share the due messages
+    """
+    sync_schema()
+    # Messages are written by the API processes, whose wakeups never reach this one
+    delivery_timer.set_change_poll(settings.SCHEDULER_STANDALONE_CHANGE_POLL_SECONDS)
+    logger.info("Starting standalone delivery worker...")
+    try:
+        await start_delivery_worker()
+    finally:
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(run_delivery_worker())
@@ -0,0 +1,4 @@
+@echo off
+echo Starting AfterLife Message Platform job worker...
+echo Run several of these to process email, AI and media jobs in parallel.
+python run_job_worker.py %*
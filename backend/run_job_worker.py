@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import logging
+import sys
+import os
+
+# Add the current directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.db.init_db import sync_schema
+from app.services.job_queue import JobWorker
+from app.services import job_handlers  # noqa: F401  (registers the job kinds)
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def run_job_worker(lanes=None, concurrency=None):
+    """
+    Run a worker for queued email, AI and media jobs
+    """
+    sync_schema()
+    logger.info("Starting standalone job worker...")
+    await JobWorker(lanes=lanes, concurrency=concurrency).run()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument("--lanes", help="Comma separated lanes to serve, e.g. critical,default (default: all)")
+    parser.add_argument("--concurrency", type=int, help="Jobs run at once (default: JOB_WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+    lanes = args.lanes.split(",") if args.lanes else None
+    asyncio.run(run_job_worker(lanes, args.concurrency))
@@ -1,4 +1,4 @@
 @echo off
 echo Starting AfterLife Message Platform scheduler...
-echo This will check for pending messages every minute.
+echo Messages are delivered as soon as they become due.
 python run_scheduler.py 
\ No newline at end of file
@@ -6,7 +6,11 @@ import os
 # Add the current directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.db.init_db import sync_schema
 from app.services.scheduler import start_scheduler
+from app.db.session import async_engine
+from app.services.delivery_timer import delivery_timer
+from app.core.config import settings
 
 # Set up logging
 logging.basicConfig(
@@ -19,8 +23,14 @@ async def run_scheduler():
     """
     Run the message scheduler
     """
+    sync_schema()
+    # Messages are written by the API processes, whose wakeups never reach this one
+    delivery_timer.set_change_poll(settings.SCHEDULER_STANDALONE_CHANGE_POLL_SECONDS)
     logger.info("Starting standalone message scheduler...")
-    await start_scheduler()
+    try:
+        await start_scheduler()
+    finally:
+        await async_engine.dispose()
 
 if __name__ == "__main__":
     asyncio.run(run_scheduler()) 
\ No newline at end of file
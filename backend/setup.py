@@ -19,6 +19,9 @@ setup(
         "psycopg2-binary==2.9.9",
         "python-dotenv==1.0.0",
         "fastapi-mail==1.4.1",
+        "aiosmtplib>=2.0.0",
+        "aiosqlite>=0.19.0",
+        "Jinja2>=3.1.0",
         "email-validator==2.1.0.post1",
         "cryptography>=42.0.0",
         "aiofiles>=23.0.0",
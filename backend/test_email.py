@@ -6,6 +6,7 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.email import send_email, EmailSchema
+from app.core.send_guard import SendPausedError
 from pydantic import EmailStr
 
 async def test_email_direct():
@@ -30,7 +31,11 @@ async def test_email_direct():
     )
     
     print(f"Sending test email to {email_to}...")
-    success = await send_email(email_schema)
+    try:
+        success = await send_email(email_schema)
+    except SendPausedError as e:
+        print(f"Sending is paused: {str(e)}")
+        success = False
     
     if success:
         print("Test email sent successfully!")
@@ -13,7 +13,6 @@ import { API_URL } from '../config';
 interface Message {
     id: number;
     title: string;
-    content: string;
     delivery_date: string;
     is_delivered: boolean;
     delivery_method: string;
@@ -35,7 +34,7 @@ const Dashboard = () => {
                     return;
                 }
 
-                const response = await fetch(`${API_URL}/messages/`, {
+                const response = await fetch(`${API_URL}/messages/summary`, {
                     headers: {
                         Authorization: `Bearer ${token}`,
                     },